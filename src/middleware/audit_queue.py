@@ -0,0 +1,182 @@
+"""
+Background writer for tenant audit log entries.
+
+log_tenant_action() hands entries to this module instead of inserting them on
+the request thread. A daemon worker drains the queue in small batches and
+writes each tenant's entries with one multi-row INSERT into that tenant's
+schema.
+
+Audit entries must not be dropped. The queue is bounded, and an entry that
+doesn't fit, or arrives while the worker isn't running, is written on the
+calling thread instead. Entries still queued when the process exits are
+flushed by an atexit hook, and failed writes are retried before the entries
+are logged as lost.
+"""
+
+from flask import current_app
+from sqlalchemy import insert, text
+from src.models.public import db
+from src.models.tenant_user import AuditLog
+from src.utils.database import tenant_schema_identifier
+import atexit
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Maximum entries written per batch, and how long the worker waits for more
+# entries to arrive before writing a partial batch (seconds)
+BATCH_SIZE = 64
+BATCH_WAIT = 0.05
+
+# Entries the queue holds before callers write synchronously
+QUEUE_SIZE = 10000
+
+# Attempts per batch write, and the delay before the first retry (seconds,
+# doubled after each failure)
+WRITE_ATTEMPTS = 3
+RETRY_DELAY = 0.5
+
+# Seconds the exit hook waits for the worker to finish its batch
+SHUTDOWN_TIMEOUT = 10
+
+# Queued by the exit hook to tell the worker to stop
+_STOP = object()
+
+_queue = queue.Queue(maxsize=QUEUE_SIZE)
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def enqueue_audit_entry(tenant_slug, entry):
+    """
+    Queue an audit log entry for writing in the background.
+
+    The entry is written immediately instead when the queue is full or the
+    worker is no longer running.
+
+    Args:
+        tenant_slug (str): Schema the entry belongs to, or None for public
+        entry (dict): audit_log column values; every entry must carry the
+            same keys so batches can be written as a single executemany
+    """
+    if _ensure_worker():
+        try:
+            _queue.put_nowait((tenant_slug, entry))
+            return
+        except queue.Full:
+            logger.warning("Audit queue full; writing entry synchronously")
+    else:
+        logger.warning("Audit writer not running; writing entry synchronously")
+
+    _write_batch([(tenant_slug, entry)])
+
+
+def _ensure_worker():
+    """
+    Start the writer thread on first use.
+
+    Returns:
+        bool: Whether the worker is running
+    """
+    global _worker
+    if _worker is None:
+        with _worker_lock:
+            if _worker is None:
+                app = current_app._get_current_object()
+                _worker = threading.Thread(
+                    target=_run,
+                    args=(app,),
+                    name='audit-log-writer',
+                    daemon=True
+                )
+                _worker.start()
+                atexit.register(_flush_at_exit, app)
+
+    return _worker.is_alive()
+
+
+def _run(app):
+    """Worker loop: block for one entry, gather a batch, write it."""
+    while True:
+        item = _queue.get()
+        stopping = item is _STOP
+        batch = [] if stopping else [item]
+        try:
+            while not stopping and len(batch) < BATCH_SIZE:
+                item = _queue.get(timeout=BATCH_WAIT)
+                if item is _STOP:
+                    stopping = True
+                else:
+                    batch.append(item)
+        except queue.Empty:
+            pass
+
+        if batch:
+            with app.app_context():
+                _write_batch(batch)
+        if stopping:
+            return
+
+
+def _flush_at_exit(app):
+    """
+    Write every entry still queued when the interpreter exits.
+
+    The worker is asked to finish its current batch first; whatever it
+    leaves behind is written here.
+    """
+    if _worker.is_alive():
+        try:
+            _queue.put(_STOP, timeout=SHUTDOWN_TIMEOUT)
+            _worker.join(SHUTDOWN_TIMEOUT)
+        except queue.Full:
+            pass
+
+    batch = []
+    while True:
+        try:
+            item = _queue.get_nowait()
+        except queue.Empty:
+            break
+        if item is not _STOP:
+            batch.append(item)
+
+    if batch:
+        with app.app_context():
+            _write_batch(batch)
+
+
+def _write_batch(batch):
+    """
+    Write a batch of queued entries, one transaction per tenant schema.
+
+    Each tenant's write is retried WRITE_ATTEMPTS times; entries that still
+    can't be written are logged in full so the record isn't lost silently.
+
+    Args:
+        batch (list): (tenant_slug, entry) pairs
+    """
+    by_tenant = {}
+    for tenant_slug, entry in batch:
+        by_tenant.setdefault(tenant_slug, []).append(entry)
+
+    for tenant_slug, entries in by_tenant.items():
+        delay = RETRY_DELAY
+        for attempt in range(1, WRITE_ATTEMPTS + 1):
+            try:
+                with db.engine.begin() as connection:
+                    if tenant_slug:
+                        connection.execute(text(f'SET LOCAL search_path TO {tenant_schema_identifier(tenant_slug)}, public'))
+                    connection.execute(insert(AuditLog.__table__), entries)
+                break
+            except Exception as e:
+                if attempt == WRITE_ATTEMPTS:
+                    logger.error("Failed to write %d audit entries for %s after %d attempts: %s; entries: %r",
+                                 len(entries), tenant_slug, attempt, e, entries)
+                else:
+                    logger.warning("Audit write for %s failed (attempt %d): %s", tenant_slug, attempt, e)
+                    time.sleep(delay)
+                    delay *= 2
@@ -10,7 +10,8 @@ from flask_jwt_extended import verify_jwt_in_request, get_jwt, get_jwt_identity,
 from functools import wraps
 from src.models.public import User, Company, CompanyUser
 from src.utils.database import DatabaseManager, set_current_tenant
-from src.models.tenant_user import AuditLog
+from src.middleware.audit_queue import enqueue_audit_entry
+from datetime import datetime
 import logging
 
 logger = logging.getLogger(__name__)
@@ -141,17 +142,7 @@ def tenant_required(f):
             set_current_tenant(tenant_slug)
             
             # Log the access
-            try:
-                AuditLog.log_action(
-                    user_id=user_id,
-                    action='access',
-                    resource_type='tenant',
-                    description=f"Accessed tenant {tenant_slug}",
-                    ip_address=request.remote_addr,
-                    user_agent=request.headers.get('User-Agent')
-                )
-            except Exception as e:
-                logger.warning(f"Failed to log tenant access: {str(e)}")
+            log_tenant_action('access', 'tenant', description=f"Accessed tenant {tenant_slug}")
             
             # Execute the original function
             return f(*args, **kwargs)
@@ -200,14 +191,16 @@ def public_route(f):
             g.current_tenant = None
             set_current_tenant(None)
             
-            return f(*args, **kwargs)
-            
         except Exception as e:
             logger.error(f"Error in public_route decorator: {str(e)}")
             return jsonify({
                 'error': 'Internal server error',
                 'message': 'An error occurred processing the request'
             }), 500
+        
+        # Errors raised by the view itself are left to the blueprint's
+        # error handlers
+        return f(*args, **kwargs)
     
     return decorated_function
 
@@ -319,17 +312,20 @@ def log_tenant_action(action, resource_type, resource_id=None, description=None,
     try:
         user_id = getattr(g, 'current_user_id', None)
         if user_id:
-            AuditLog.log_action(
-                user_id=user_id,
-                action=action,
-                resource_type=resource_type,
-                resource_id=resource_id,
-                description=description,
-                old_values=old_values,
-                new_values=new_values,
-                ip_address=request.remote_addr,
-                user_agent=request.headers.get('User-Agent')
-            )
+            # Written by the background audit writer, off the request path
+            enqueue_audit_entry(getattr(g, 'current_tenant', None), {
+                'user_id': user_id,
+                'action': action,
+                'resource_type': resource_type,
+                'resource_id': resource_id,
+                'description': description,
+                'old_values': old_values,
+                'new_values': new_values,
+                'ip_address': request.remote_addr,
+                'user_agent': request.headers.get('User-Agent'),
+                'session_id': None,
+                'timestamp': datetime.utcnow()
+            })
     except Exception as e:
         logger.warning(f"Failed to log tenant action: {str(e)}")
 
@@ -341,11 +337,16 @@ def get_current_user_profile():
     Returns:
         TenantUserProfile: User profile within current tenant or None
     """
+    if 'current_user_profile' in g:
+        return g.current_user_profile
+    
     try:
         from src.models.tenant_user import TenantUserProfile
         user_id = getattr(g, 'current_user_id', None)
         if user_id:
-            return TenantUserProfile.query.filter_by(user_id=user_id).first()
+            # Memoized for the rest of the request
+            g.current_user_profile = TenantUserProfile.query.filter_by(user_id=user_id).first()
+            return g.current_user_profile
         return None
     except Exception as e:
         logger.error(f"Error getting current user profile: {str(e)}")
@@ -14,6 +14,11 @@ class Appointment(db.Model):
     recurrence_end_date = db.Column(db.DateTime)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Serves per-clinician day schedules filtered by status
+    __table_args__ = (
+        db.Index('ix_appointment_clinician_start_status', 'clinician_id', 'start_time', 'status'),
+    )
+
     # Relationships
     patient = db.relationship('Patient', backref='patient_appointments')
     clinician = db.relationship('User', backref='clinician_appointments')
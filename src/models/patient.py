@@ -41,6 +41,11 @@ class Patient(db.Model):
     zip_code = db.Column(db.String(10))
     country = db.Column(db.String(50), default='USA')
     
+    # Geographic coordinates for routing; existing tenant schemas get these
+    # via DatabaseManager.upgrade_patient_coordinates()
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+    
     # Emergency contact
     emergency_contact_name = db.Column(db.String(100))
     emergency_contact_relationship = db.Column(db.String(50))
@@ -128,6 +133,13 @@ class Patient(db.Model):
     last_visit_date = db.Column(db.Date)
     next_appointment_date = db.Column(db.Date)
     
+    # Partial indexes over active patients for the list filters and ordering
+    __table_args__ = (
+        db.Index('ix_patient_active_status', 'status', postgresql_where=db.text('is_active')),
+        db.Index('ix_patient_active_name', 'last_name', 'first_name', 'id',
+                 postgresql_where=db.text('is_active')),
+    )
+    
     # Relationships
     client = db.relationship('Client', back_populates='patients')
     appointments = db.relationship('Appointment', back_populates='patient', lazy='dynamic')
@@ -235,6 +247,8 @@ class Patient(db.Model):
             'zip_code': self.zip_code,
             'country': self.country,
             'full_address': self.get_full_address(),
+            'latitude': self.latitude,
+            'longitude': self.longitude,
             'emergency_contact_name': self.emergency_contact_name,
             'emergency_contact_relationship': self.emergency_contact_relationship,
             'emergency_contact_phone': self.emergency_contact_phone,
@@ -305,3 +319,18 @@ class Patient(db.Model):
         
         return data
 
+
+# Text searched by the patient list. Filter with PATIENT_SEARCH_TEXT.ilike()
+# so PostgreSQL can answer substring searches from the trigram index below.
+PATIENT_SEARCH_TEXT = (
+    Patient.first_name + ' ' + Patient.last_name + ' ' +
+    db.func.coalesce(Patient.medical_record_number, '')
+)
+
+db.Index(
+    'ix_patient_search_trgm',
+    PATIENT_SEARCH_TEXT.label('search_text'),
+    postgresql_using='gin',
+    postgresql_ops={'search_text': 'gin_trgm_ops'},
+    postgresql_where=Patient.is_active
+)
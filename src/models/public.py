@@ -7,11 +7,47 @@ and tenant-user relationships.
 """
 
 from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import generate_password_hash, check_password_hash
+from src.utils.passwords import hash_password, verify_password, password_needs_rehash
+from dataclasses import dataclass
 from datetime import datetime
+import orjson
 import uuid
 
-db = SQLAlchemy()
+# Pool sized for bursts of concurrent logins and dashboard refreshes, so
+# requests reuse warm connections instead of opening new ones. Connections
+# are pinged on checkout so one dropped by the server or a failover is
+# replaced instead of failing the request, and a request waits at most
+# pool_timeout seconds for a free connection. Deployments can still override
+# these through SQLALCHEMY_ENGINE_OPTIONS. JSON columns are encoded with
+# orjson, which also accepts dates and datetimes.
+db = SQLAlchemy(engine_options={
+    'pool_size': 20,
+    'max_overflow': 40,
+    'pool_timeout': 30,
+    'pool_recycle': 1800,
+    'pool_pre_ping': True,
+    'json_serializer': lambda obj: orjson.dumps(obj).decode()
+})
+
+# Bits of CompanyUser.permissions_mask
+PERM_MANAGE_USERS = 1
+PERM_MANAGE_SETTINGS = 2
+PERM_VIEW_REPORTS = 4
+PERM_MANAGE_BILLING = 8
+PERM_ALL = PERM_MANAGE_USERS | PERM_MANAGE_SETTINGS | PERM_VIEW_REPORTS | PERM_MANAGE_BILLING
+
+
+def _permission_flag(bit):
+    """Expose one bit of permissions_mask as a boolean attribute."""
+    def getter(self):
+        return bool((self.permissions_mask or 0) & bit)
+    
+    def setter(self, value):
+        mask = self.permissions_mask or 0
+        self.permissions_mask = mask | bit if value else mask & ~bit
+    
+    return property(getter, setter)
+
 
 class Company(db.Model):
     """
@@ -51,6 +87,9 @@ class Company(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     is_active = db.Column(db.Boolean, default=True)
+    # pending, ready, failed; existing databases get this column via
+    # DatabaseManager.upgrade_company_provisioning_status()
+    provisioning_status = db.Column(db.String(20), default='ready')
     
     # Relationships
     company_users = db.relationship('CompanyUser', back_populates='company', cascade='all, delete-orphan')
@@ -78,7 +117,8 @@ class Company(db.Model):
             'secondary_color': self.secondary_color,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'is_active': self.is_active
+            'is_active': self.is_active,
+            'provisioning_status': self.provisioning_status
         }
 
 
@@ -128,10 +168,15 @@ class User(db.Model):
         return self.username
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        if not verify_password(self.password_hash, password):
+            return False
+        # Upgrade legacy or outdated hashes while we have the plain password
+        if password_needs_rehash(self.password_hash):
+            self.set_password(password)
+        return True
     
     def generate_reset_token(self):
         """Generate a password reset token"""
@@ -194,10 +239,14 @@ class CompanyUser(db.Model):
     
     # Permissions and access
     permissions = db.Column(db.JSON)  # Store custom permissions as JSON
-    can_manage_users = db.Column(db.Boolean, default=False)
-    can_manage_settings = db.Column(db.Boolean, default=False)
-    can_view_reports = db.Column(db.Boolean, default=False)
-    can_manage_billing = db.Column(db.Boolean, default=False)
+    # PERM_* bits; existing databases get this column from the old can_*
+    # booleans via DatabaseManager.upgrade_company_user_permissions()
+    permissions_mask = db.Column(db.SmallInteger, nullable=False, default=0)
+    
+    can_manage_users = _permission_flag(PERM_MANAGE_USERS)
+    can_manage_settings = _permission_flag(PERM_MANAGE_SETTINGS)
+    can_view_reports = _permission_flag(PERM_VIEW_REPORTS)
+    can_manage_billing = _permission_flag(PERM_MANAGE_BILLING)
     
     # Status
     is_active = db.Column(db.Boolean, default=True)
@@ -213,9 +262,11 @@ class CompanyUser(db.Model):
     user = db.relationship('User', back_populates='company_users')
     company = db.relationship('Company', back_populates='company_users')
     
-    # Unique constraint to prevent duplicate user-company relationships
+    # Unique constraint to prevent duplicate user-company relationships;
+    # the index backs the per-user active membership lookups
     __table_args__ = (
         db.UniqueConstraint('user_id', 'company_id', name='unique_user_company'),
+        db.Index('ix_company_user_user_active', 'user_id', 'is_active'),
         {'schema': 'public'}
     )
     
@@ -379,3 +430,127 @@ class SystemConfiguration(db.Model):
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
 
+
+
+# Lightweight read-only views used by the auth endpoints. They mirror the
+# to_dict() fields but keep datetimes as-is for orjson to encode, and avoid
+# per-instance __dict__ allocation.
+
+@dataclass(slots=True)
+class CompanyDTO:
+    id: int
+    name: str
+    slug: str
+    description: str
+    email: str
+    phone: str
+    address: str
+    website: str
+    subscription_plan: str
+    subscription_status: str
+    timezone: str
+    date_format: str
+    time_format: str
+    logo_url: str
+    primary_color: str
+    secondary_color: str
+    created_at: datetime
+    updated_at: datetime
+    is_active: bool
+    provisioning_status: str
+    
+    @classmethod
+    def from_model(cls, company):
+        return cls(
+            id=company.id,
+            name=company.name,
+            slug=company.slug,
+            description=company.description,
+            email=company.email,
+            phone=company.phone,
+            address=company.address,
+            website=company.website,
+            subscription_plan=company.subscription_plan,
+            subscription_status=company.subscription_status,
+            timezone=company.timezone,
+            date_format=company.date_format,
+            time_format=company.time_format,
+            logo_url=company.logo_url,
+            primary_color=company.primary_color,
+            secondary_color=company.secondary_color,
+            created_at=company.created_at,
+            updated_at=company.updated_at,
+            is_active=company.is_active,
+            provisioning_status=company.provisioning_status
+        )
+
+
+@dataclass(slots=True)
+class CompanyMembershipDTO(CompanyDTO):
+    role: str
+    permissions: dict
+    joined_at: datetime
+    last_access: datetime
+    
+    @classmethod
+    def from_company_user(cls, company_user):
+        company = company_user.company
+        return cls(
+            id=company.id,
+            name=company.name,
+            slug=company.slug,
+            description=company.description,
+            email=company.email,
+            phone=company.phone,
+            address=company.address,
+            website=company.website,
+            subscription_plan=company.subscription_plan,
+            subscription_status=company.subscription_status,
+            timezone=company.timezone,
+            date_format=company.date_format,
+            time_format=company.time_format,
+            logo_url=company.logo_url,
+            primary_color=company.primary_color,
+            secondary_color=company.secondary_color,
+            created_at=company.created_at,
+            updated_at=company.updated_at,
+            is_active=company.is_active,
+            provisioning_status=company.provisioning_status,
+            role=company_user.role,
+            permissions=company_user.permissions,
+            joined_at=company_user.joined_at,
+            last_access=company_user.last_access
+        )
+
+
+@dataclass(slots=True)
+class UserDTO:
+    id: int
+    username: str
+    email: str
+    first_name: str
+    last_name: str
+    full_name: str
+    phone: str
+    is_active: bool
+    is_verified: bool
+    last_login: datetime
+    created_at: datetime
+    updated_at: datetime
+    
+    @classmethod
+    def from_model(cls, user):
+        return cls(
+            id=user.id,
+            username=user.username,
+            email=user.email,
+            first_name=user.first_name,
+            last_name=user.last_name,
+            full_name=user.full_name,
+            phone=user.phone,
+            is_active=user.is_active,
+            is_verified=user.is_verified,
+            last_login=user.last_login,
+            created_at=user.created_at,
+            updated_at=user.updated_at
+        )
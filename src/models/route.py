@@ -1,6 +1,6 @@
 from src.models.user import db
 from datetime import datetime
-import json
+import orjson
 
 class Route(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -20,13 +20,13 @@ class Route(db.Model):
         return f'<Route {self.id} - {self.clinician.username if self.clinician else "Unknown"} on {self.route_date}>'
 
     def set_optimized_path(self, path_data):
-        """Store route path data as JSON string"""
-        self.optimized_path = json.dumps(path_data)
+        """Store route path data as JSON string; datetimes are written in ISO format"""
+        self.optimized_path = orjson.dumps(path_data).decode()
 
     def get_optimized_path(self):
         """Retrieve route path data from JSON string"""
         if self.optimized_path:
-            return json.loads(self.optimized_path)
+            return orjson.loads(self.optimized_path)
         return None
 
     def to_dict(self):
@@ -52,6 +52,9 @@ class RouteStop(db.Model):
     arrival_time = db.Column(db.DateTime)
     departure_time = db.Column(db.DateTime)
     status = db.Column(db.String(20), default='pending')  # pending, in-progress, completed, skipped
+    # Existing databases get this column via upgrade_route_stop_timestamps()
+    # in src.utils.database
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationships
     route = db.relationship('Route', backref='route_stops')
@@ -70,8 +73,8 @@ class RouteStop(db.Model):
             'arrival_time': self.arrival_time.isoformat() if self.arrival_time else None,
             'departure_time': self.departure_time.isoformat() if self.departure_time else None,
             'status': self.status,
-            'patient_name': self.appointment.patient.name if self.appointment and self.appointment.patient else None,
-            'patient_address': self.appointment.patient.address if self.appointment and self.appointment.patient else None,
-            'patient_phone': self.appointment.patient.phone if self.appointment and self.appointment.patient else None
+            'patient_name': self.appointment.patient.full_name if self.appointment and self.appointment.patient else None,
+            'patient_address': self.appointment.patient.address_line1 if self.appointment and self.appointment.patient else None,
+            'patient_phone': self.appointment.patient.phone_primary if self.appointment and self.appointment.patient else None
         }
 
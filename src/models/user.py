@@ -1,9 +1,12 @@
 from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import generate_password_hash, check_password_hash
+from src.utils.passwords import hash_password, verify_password, password_needs_rehash
 from datetime import datetime
 
 db = SQLAlchemy()
 
+# Roles a user account may hold
+VALID_ROLES = frozenset({'Admin', 'Clinician', 'Office Staff'})
+
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
@@ -14,14 +17,25 @@ class User(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     is_active = db.Column(db.Boolean, default=True)
 
+    # Serves the active clinician list without scanning every user
+    __table_args__ = (
+        db.Index('ix_users_clinicians_active', 'id',
+                 postgresql_where=db.text("role = 'Clinician' AND is_active")),
+    )
+
     def __repr__(self):
         return f'<User {self.username}>'
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        if not verify_password(self.password_hash, password):
+            return False
+        # Upgrade legacy or outdated hashes while we have the plain password
+        if password_needs_rehash(self.password_hash):
+            self.set_password(password)
+        return True
 
     def to_dict(self):
         return {
@@ -2,11 +2,30 @@ from flask import Blueprint, jsonify, request, session
 from src.models.appointment import Appointment
 from src.models.user import User, db
 from src.routes.auth import login_required, admin_required
-from datetime import datetime, timedelta
+from sqlalchemy.orm import joinedload
+from dateutil.relativedelta import relativedelta
+from datetime import datetime
 import dateutil.parser
+import itertools
 
 appointment_bp = Blueprint('appointment', __name__)
 
+def _list_options():
+    """
+    Loader options for appointment lists.
+    
+    to_dict() only reads the clinician's username, so don't pull the whole
+    user row. Built per request: the mappers can't be configured at import
+    time, before every model module is loaded.
+    """
+    return (joinedload(Appointment.clinician).load_only(User.id, User.username),)
+
+_RECURRENCE_STEPS = {
+    'daily': relativedelta(days=1),
+    'weekly': relativedelta(weeks=1),
+    'monthly': relativedelta(months=1),
+}
+
 @appointment_bp.route('/appointments', methods=['GET'])
 @login_required
 def get_appointments():
@@ -20,7 +39,7 @@ def get_appointments():
         patient_id = request.args.get('patient_id')
         
         # Base query
-        query = Appointment.query
+        query = Appointment.query.options(*_list_options())
         
         # Role-based filtering
         if user.role == 'Clinician':
@@ -103,36 +122,33 @@ def create_appointment():
 def create_recurring_appointments(base_appointment):
     """Create recurring appointments based on the pattern"""
     try:
-        current_date = base_appointment.start_time
-        end_date = base_appointment.recurrence_end_date
-        pattern = base_appointment.recurrence_pattern
-        
-        # Calculate interval based on pattern
-        if pattern == 'daily':
-            interval = timedelta(days=1)
-        elif pattern == 'weekly':
-            interval = timedelta(weeks=1)
-        elif pattern == 'monthly':
-            interval = timedelta(days=30)  # Approximate monthly
-        else:
+        step = _RECURRENCE_STEPS.get(base_appointment.recurrence_pattern)
+        if step is None:
             return
         
-        duration = base_appointment.end_time - base_appointment.start_time
+        base_start = base_appointment.start_time
+        end_date = base_appointment.recurrence_end_date
+        duration = base_appointment.end_time - base_start
+        
+        # Offsets are taken from the base start (not chained) so monthly
+        # occurrences keep their day of month instead of drifting
+        occurrences = itertools.takewhile(
+            lambda start: start <= end_date,
+            (base_start + step * i for i in itertools.count(1))
+        )
         
-        while current_date + interval <= end_date:
-            current_date += interval
-            
-            recurring_appointment = Appointment(
+        db.session.add_all([
+            Appointment(
                 patient_id=base_appointment.patient_id,
                 clinician_id=base_appointment.clinician_id,
-                start_time=current_date,
-                end_time=current_date + duration,
+                start_time=start,
+                end_time=start + duration,
                 appointment_type=base_appointment.appointment_type,
                 notes=base_appointment.notes,
                 recurrence_pattern=base_appointment.recurrence_pattern
             )
-            
-            db.session.add(recurring_appointment)
+            for start in occurrences
+        ])
         
         db.session.commit()
         
@@ -226,7 +242,7 @@ def get_clinician_schedule(clinician_id):
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
         
-        query = Appointment.query.filter_by(clinician_id=clinician_id)
+        query = Appointment.query.options(*_list_options()).filter_by(clinician_id=clinician_id)
         
         if start_date:
             start_dt = dateutil.parser.parse(start_date)
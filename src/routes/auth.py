@@ -1,9 +1,24 @@
-from flask import Blueprint, request, jsonify, session
-from src.models.user import User, db
+from flask import Blueprint, request, jsonify, session, g
+from src.models.user import User, VALID_ROLES, db
+from src.utils.cache import invalidate_cached_responses
+from sqlalchemy.orm import load_only
 from functools import wraps
 
 auth_bp = Blueprint('auth', __name__)
 
+def current_user():
+    """
+    Return the logged-in user, loading it at most once per request.
+    
+    Only the id, role and active flag are fetched up front; anything else
+    is loaded on first access.
+    """
+    if 'current_user' not in g:
+        g.current_user = User.query.options(
+            load_only(User.id, User.role, User.is_active)
+        ).get(session['user_id'])
+    return g.current_user
+
 def login_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
@@ -13,13 +28,15 @@ def login_required(f):
     return decorated_function
 
 def admin_required(f):
+    # The role is checked against the database on every request, so demoting,
+    # deactivating or deleting an admin takes effect immediately
     @wraps(f)
     def decorated_function(*args, **kwargs):
         if 'user_id' not in session:
             return jsonify({'error': 'Authentication required'}), 401
         
-        user = User.query.get(session['user_id'])
-        if not user or user.role != 'Admin':
+        user = current_user()
+        if not user or not user.is_active or user.role != 'Admin':
             return jsonify({'error': 'Admin access required'}), 403
         return f(*args, **kwargs)
     return decorated_function
@@ -43,8 +60,7 @@ def register():
             return jsonify({'error': 'Email already exists'}), 400
         
         # Validate role
-        valid_roles = ['Admin', 'Clinician', 'Office Staff']
-        if data['role'] not in valid_roles:
+        if data['role'] not in VALID_ROLES:
             return jsonify({'error': 'Invalid role'}), 400
         
         # Create new user
@@ -59,6 +75,9 @@ def register():
         db.session.add(user)
         db.session.commit()
         
+        # New accounts show up in the cached user lists
+        invalidate_cached_responses(('user_lists',))
+        
         return jsonify({
             'message': 'User registered successfully',
             'user': user.to_dict()
@@ -79,6 +98,8 @@ def login():
         user = User.query.filter_by(username=data['username']).first()
         
         if user and user.check_password(data['password']) and user.is_active:
+            # Persist a rehashed password if check_password upgraded it
+            db.session.commit()
             session['user_id'] = user.id
             session['user_role'] = user.role
             return jsonify({
@@ -2,11 +2,32 @@ from flask import Blueprint, jsonify, request, session
 from src.models.message import Message, MessageTemplate
 from src.models.user import User, db
 from src.routes.auth import login_required, admin_required
+from sqlalchemy import func, text
+from sqlalchemy.orm import joinedload
 from datetime import datetime
 import dateutil.parser
 
 message_bp = Blueprint('message', __name__)
 
+# to_dict() only reads usernames from the related users. The loader options
+# are built per request: the mappers can't be configured at import time,
+# before every model module is loaded.
+
+def _message_list_options():
+    return (
+        joinedload(Message.sender).load_only(User.id, User.username),
+        joinedload(Message.recipient).load_only(User.id, User.username),
+    )
+
+def _template_list_options():
+    return (joinedload(MessageTemplate.creator).load_only(User.id, User.username),)
+
+# Evaluated by the database so the statement text is identical on every request
+_DATE_RANGE_INTERVALS = {
+    'week': text("INTERVAL '7 days'"),
+    'month': text("INTERVAL '30 days'"),
+}
+
 @message_bp.route('/messages/send', methods=['POST'])
 @admin_required
 def send_message():
@@ -110,10 +131,10 @@ def get_communication_logs():
         
         # Base query
         if user.role == 'Admin':
-            query = Message.query
+            query = Message.query.options(*_message_list_options())
         else:
             # Non-admin users can only see their own messages
-            query = Message.query.filter(
+            query = Message.query.options(*_message_list_options()).filter(
                 (Message.sender_id == user.id) | (Message.recipient_id == user.id)
             )
         
@@ -124,14 +145,9 @@ def get_communication_logs():
         if status:
             query = query.filter_by(status=status)
         
-        if date_range:
+        if date_range in _DATE_RANGE_INTERVALS:
             # Simple date range filtering (last 7 days, 30 days, etc.)
-            if date_range == 'week':
-                start_date = datetime.now() - timedelta(days=7)
-                query = query.filter(Message.created_at >= start_date)
-            elif date_range == 'month':
-                start_date = datetime.now() - timedelta(days=30)
-                query = query.filter(Message.created_at >= start_date)
+            query = query.filter(Message.created_at >= func.now() - _DATE_RANGE_INTERVALS[date_range])
         
         messages = query.order_by(Message.created_at.desc()).all()
         return jsonify([message.to_dict() for message in messages])
@@ -206,7 +222,7 @@ def schedule_message():
 @login_required
 def get_templates():
     try:
-        templates = MessageTemplate.query.filter_by(is_active=True).all()
+        templates = MessageTemplate.query.options(*_template_list_options()).filter_by(is_active=True).all()
         return jsonify([template.to_dict() for template in templates])
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -5,21 +5,61 @@ This module handles authentication, company management, and user registration
 for the multi-tenant architecture.
 """
 
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, current_app
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity, get_jwt
 from werkzeug.security import check_password_hash
+from sqlalchemy import exists, func, or_, select, union_all, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import contains_eager, joinedload
 from datetime import datetime, timedelta
-from src.models.public import db, User, Company, CompanyUser, Practice
+from src.models.public import (
+    db, User, Company, CompanyUser, Practice, PERM_ALL,
+    CompanyDTO, CompanyMembershipDTO, UserDTO
+)
 from src.utils.database import DatabaseManager
+from src.utils.passwords import burn_password_check
+from src.utils.serialization import json_response
 from src.middleware.tenant import public_route, log_tenant_action
+from cachetools import TTLCache
+import hashlib
+import hmac
 import re
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 
 # Create blueprint for multi-tenant auth routes
 mt_auth_bp = Blueprint('mt_auth', __name__, url_prefix='/api/v1')
 
+# Any run of characters outside [a-z0-9] becomes a single hyphen
+_SLUG_CLEAN = re.compile(r'[^a-z0-9]+')
+# Lowercase letters, numbers and hyphens; cannot start or end with a hyphen
+_SLUG_VALID = re.compile(r'^[a-z0-9]([a-z0-9\-]*[a-z0-9])?$')
+# Number of slug candidates checked per uniqueness query
+_SLUG_PROBE_BATCH = 16
+
+# Recently rejected (user, password) pairs so repeated wrong guesses don't
+# rerun the password hash. Keys are HMACs; plain passwords are never stored.
+_failed_logins = TTLCache(maxsize=10000, ttl=60)
+_failed_logins_lock = threading.Lock()
+
+# Lifetime of tokens issued at login and on company switch
+ACCESS_TOKEN_EXPIRES = timedelta(hours=24)
+
+
+@mt_auth_bp.record_once
+def configure_jwt(state):
+    """
+    Default token signing to HS256.
+    
+    Tokens are minted on every login and company switch; HMAC signing costs
+    microseconds where RSA signing costs milliseconds. Deployments that set
+    JWT_ALGORITHM explicitly keep their choice.
+    """
+    state.app.config.setdefault('JWT_ALGORITHM', 'HS256')
+
+
 @mt_auth_bp.route('/auth/login', methods=['POST'])
 @public_route
 def login():
@@ -33,104 +73,118 @@ def login():
         "company_slug": "optional_company_slug"
     }
     """
-    try:
-        data = request.get_json()
-        if not data:
-            return jsonify({'error': 'No data provided'}), 400
-        
-        username = data.get('username')
-        password = data.get('password')
-        company_slug = data.get('company_slug')
-        
-        if not username or not password:
-            return jsonify({'error': 'Username and password required'}), 400
-        
-        # Find user by username or email
-        user = User.query.filter(
-            (User.username == username) | (User.email == username)
-        ).first()
-        
-        if not user or not user.check_password(password):
-            return jsonify({'error': 'Invalid credentials'}), 401
-        
-        if not user.is_active:
-            return jsonify({'error': 'Account is inactive'}), 401
-        
-        if user.is_locked():
-            return jsonify({'error': 'Account is locked due to failed login attempts'}), 401
-        
-        # Get user's companies
-        user_companies = CompanyUser.query.filter_by(
-            user_id=user.id,
-            is_active=True
-        ).join(Company).filter(Company.is_active == True).all()
-        
-        if not user_companies:
-            return jsonify({'error': 'No active company access found'}), 403
-        
-        # If company_slug is provided, validate access
-        selected_company = None
-        if company_slug:
-            selected_company = next(
-                (cu for cu in user_companies if cu.company.slug == company_slug),
-                None
-            )
-            if not selected_company:
-                return jsonify({'error': f'No access to company "{company_slug}"'}), 403
-        else:
-            # Use the first company if none specified
-            selected_company = user_companies[0]
-        
-        # Update user login information
-        user.last_login = datetime.utcnow()
-        user.failed_login_attempts = 0
-        user.locked_until = None
-        
-        # Update company user last access
-        selected_company.last_access = datetime.utcnow()
-        if not selected_company.joined_at:
-            selected_company.joined_at = datetime.utcnow()
-        
-        db.session.commit()
-        
-        # Create JWT token with company information
-        additional_claims = {
-            'tenant': selected_company.company.slug,
-            'company_id': selected_company.company.id,
-            'role': selected_company.role,
-            'permissions': selected_company.permissions or {}
+    data = request.get_json()
+    if not data:
+        return json_response({'error': 'No data provided'}, 400)
+    
+    username = data.get('username')
+    password = data.get('password')
+    company_slug = data.get('company_slug')
+    
+    if not username or not password:
+        return json_response({'error': 'Username and password required'}, 400)
+    
+    # Find user by username or email, loading their company memberships
+    # in the same statement. The two lookups are UNION ALLed rather than
+    # ORed so each can use its own unique index.
+    user_ids = union_all(
+        select(User.id).where(User.username == username),
+        select(User.id).where(User.email == username)
+    )
+    # Inactive and locked accounts are filtered out here and are rejected
+    # exactly like unknown ones.
+    user = User.query.options(
+        joinedload(User.company_users).joinedload(CompanyUser.company)
+    ).filter(
+        User.id.in_(user_ids),
+        User.is_active == True,
+        or_(User.locked_until.is_(None), User.locked_until <= datetime.utcnow())
+    ).first()
+    
+    # Unknown users go through the same (slow) check as wrong passwords
+    # so response times don't reveal which usernames exist
+    if not check_login_password(username, user, password):
+        return json_response({'error': 'Invalid credentials'}, 401)
+    
+    # Get user's companies
+    user_companies = [
+        cu for cu in user.company_users
+        if cu.is_active and cu.company.is_active
+    ]
+    
+    if not user_companies:
+        return json_response({'error': 'No active company access found'}, 403)
+    
+    # If company_slug is provided, validate access
+    selected_company = None
+    if company_slug:
+        companies_by_slug = {cu.company.slug: cu for cu in user_companies}
+        selected_company = companies_by_slug.get(company_slug)
+        if not selected_company:
+            return json_response({'error': f'No access to company "{company_slug}"'}, 403)
+    else:
+        # Use the first company if none specified
+        selected_company = user_companies[0]
+    
+    # Record the login with two targeted UPDATEs rather than dirtying
+    # both ORM objects. The user's new values are copied onto the loaded
+    # instance, so the response can be built from it before the commit
+    # expires everything the login query loaded.
+    now = datetime.utcnow()
+    db.session.execute(
+        update(User)
+        .where(User.id == user.id)
+        .values(last_login=now, failed_login_attempts=0, locked_until=None, updated_at=now)
+        .execution_options(synchronize_session='evaluate')
+    )
+    db.session.execute(
+        update(CompanyUser)
+        .where(CompanyUser.id == selected_company.id)
+        .values(last_access=now, joined_at=func.coalesce(CompanyUser.joined_at, now))
+        .execution_options(synchronize_session=False)
+    )
+    
+    # Create JWT token with company information
+    additional_claims = {
+        'tenant': selected_company.company.slug,
+        'company_id': selected_company.company.id,
+        'role': selected_company.role,
+        'permissions': selected_company.permissions or {}
+    }
+    
+    access_token = create_access_token(
+        identity=user.id,
+        additional_claims=additional_claims,
+        expires_delta=ACCESS_TOKEN_EXPIRES
+    )
+    
+    # Prepare response
+    current_slug = selected_company.company.slug
+    companies_data = [
+        {
+            'id': company.id,
+            'name': company.name,
+            'slug': company.slug,
+            'role': cu.role,
+            'permissions': cu.permissions,
+            'is_current': company.slug == current_slug
         }
-        
-        access_token = create_access_token(
-            identity=user.id,
-            additional_claims=additional_claims,
-            expires_delta=timedelta(hours=24)
-        )
-        
-        # Prepare response
-        companies_data = []
-        for cu in user_companies:
-            companies_data.append({
-                'id': cu.company.id,
-                'name': cu.company.name,
-                'slug': cu.company.slug,
-                'role': cu.role,
-                'permissions': cu.permissions,
-                'is_current': cu.company.slug == selected_company.company.slug
-            })
-        
-        return jsonify({
-            'access_token': access_token,
-            'user': user.to_dict(),
-            'current_company': selected_company.company.to_dict(),
-            'current_role': selected_company.role,
-            'companies': companies_data,
-            'permissions': selected_company.permissions or {}
-        }), 200
-        
-    except Exception as e:
-        logger.error(f"Login error: {str(e)}")
-        return jsonify({'error': 'Internal server error'}), 500
+        for cu in user_companies
+        for company in (cu.company,)
+    ]
+    
+    response_data = {
+        'access_token': access_token,
+        'user': UserDTO.from_model(user),
+        'current_company': CompanyDTO.from_model(selected_company.company),
+        'current_role': selected_company.role,
+        'companies': companies_data,
+        'permissions': selected_company.permissions or {}
+    }
+    
+    db.session.commit()
+    
+    return json_response(response_data, 200)
 
 
 @mt_auth_bp.route('/auth/switch-company', methods=['POST'])
@@ -145,54 +199,54 @@ def switch_company():
         "company_slug": "new_company_slug"
     }
     """
-    try:
-        user_id = get_jwt_identity()
-        data = request.get_json()
-        
-        if not data or 'company_slug' not in data:
-            return jsonify({'error': 'Company slug required'}), 400
-        
-        company_slug = data['company_slug']
-        
-        # Validate user access to the company
-        company_user = CompanyUser.query.join(Company).filter(
-            CompanyUser.user_id == user_id,
-            Company.slug == company_slug,
-            CompanyUser.is_active == True,
-            Company.is_active == True
-        ).first()
-        
-        if not company_user:
-            return jsonify({'error': f'No access to company "{company_slug}"'}), 403
-        
-        # Update last access
-        company_user.last_access = datetime.utcnow()
-        db.session.commit()
-        
-        # Create new JWT token with updated company information
-        additional_claims = {
-            'tenant': company_user.company.slug,
-            'company_id': company_user.company.id,
-            'role': company_user.role,
-            'permissions': company_user.permissions or {}
-        }
-        
-        access_token = create_access_token(
-            identity=user_id,
-            additional_claims=additional_claims,
-            expires_delta=timedelta(hours=24)
-        )
-        
-        return jsonify({
-            'access_token': access_token,
-            'current_company': company_user.company.to_dict(),
-            'current_role': company_user.role,
-            'permissions': company_user.permissions or {}
-        }), 200
-        
-    except Exception as e:
-        logger.error(f"Switch company error: {str(e)}")
-        return jsonify({'error': 'Internal server error'}), 500
+    user_id = get_jwt_identity()
+    data = request.get_json()
+    
+    if not data or 'company_slug' not in data:
+        return json_response({'error': 'Company slug required'}, 400)
+    
+    company_slug = data['company_slug']
+    
+    # Validate user access to the company
+    company_user = CompanyUser.query.join(Company).filter(
+        CompanyUser.user_id == user_id,
+        Company.slug == company_slug,
+        CompanyUser.is_active == True,
+        Company.is_active == True
+    ).options(contains_eager(CompanyUser.company)).first()
+    
+    if not company_user:
+        return json_response({'error': f'No access to company "{company_slug}"'}, 403)
+    
+    # Update last access
+    company_user.last_access = datetime.utcnow()
+    
+    # Create new JWT token with updated company information
+    additional_claims = {
+        'tenant': company_user.company.slug,
+        'company_id': company_user.company.id,
+        'role': company_user.role,
+        'permissions': company_user.permissions or {}
+    }
+    
+    access_token = create_access_token(
+        identity=user_id,
+        additional_claims=additional_claims,
+        expires_delta=ACCESS_TOKEN_EXPIRES
+    )
+    
+    # Built before the commit, which would expire the membership and its
+    # company and reload each of them
+    response_data = {
+        'access_token': access_token,
+        'current_company': CompanyDTO.from_model(company_user.company),
+        'current_role': company_user.role,
+        'permissions': company_user.permissions or {}
+    }
+    
+    db.session.commit()
+    
+    return json_response(response_data, 200)
 
 
 @mt_auth_bp.route('/auth/register', methods=['POST'])
@@ -219,116 +273,113 @@ def register():
         }
     }
     """
-    try:
-        data = request.get_json()
-        if not data:
-            return jsonify({'error': 'No data provided'}), 400
-        
-        # Validate required fields
-        required_fields = ['username', 'email', 'password', 'first_name', 'last_name']
-        for field in required_fields:
-            if not data.get(field):
-                return jsonify({'error': f'{field} is required'}), 400
-        
-        # Check if user already exists
-        existing_user = User.query.filter(
-            (User.username == data['username']) | (User.email == data['email'])
-        ).first()
+    data = request.get_json()
+    if not data:
+        return json_response({'error': 'No data provided'}, 400)
+    
+    # Validate required fields
+    required_fields = ['username', 'email', 'password', 'first_name', 'last_name']
+    for field in required_fields:
+        if not data.get(field):
+            return json_response({'error': f'{field} is required'}, 400)
+    
+    # Check if user already exists
+    existing_user = User.query.filter(
+        (User.username == data['username']) | (User.email == data['email'])
+    ).first()
+    
+    if existing_user:
+        return json_response({'error': 'User with this username or email already exists'}, 409)
+    
+    # Validate company data if provided
+    company_data = data.get('company')
+    if company_data:
+        if not company_data.get('name'):
+            return json_response({'error': 'Company name is required'}, 400)
         
-        if existing_user:
-            return jsonify({'error': 'User with this username or email already exists'}), 409
+        # Generate slug if not provided
+        if not company_data.get('slug'):
+            company_slug = generate_company_slug(company_data['name'])
+        else:
+            company_slug = company_data['slug']
         
-        # Validate company data if provided
-        company_data = data.get('company')
-        if company_data:
-            if not company_data.get('name'):
-                return jsonify({'error': 'Company name is required'}), 400
-            
-            # Generate slug if not provided
-            if not company_data.get('slug'):
-                company_slug = generate_company_slug(company_data['name'])
-            else:
-                company_slug = company_data['slug']
-            
-            # Validate slug format
-            if not is_valid_slug(company_slug):
-                return jsonify({'error': 'Invalid company slug format'}), 400
-            
-            # Check if company slug already exists
-            existing_company = Company.query.filter_by(slug=company_slug).first()
-            if existing_company:
-                return jsonify({'error': f'Company slug "{company_slug}" already exists'}), 409
+        # Validate slug format
+        if not is_valid_slug(company_slug):
+            return json_response({'error': 'Invalid company slug format'}, 400)
         
-        # Create user
-        user = User(
-            username=data['username'],
-            email=data['email'],
-            first_name=data['first_name'],
-            last_name=data['last_name'],
-            phone=data.get('phone'),
-            is_verified=False  # Email verification would be implemented separately
+        # Check if company slug already exists
+        if slug_exists(company_slug):
+            return json_response({'error': f'Company slug "{company_slug}" already exists'}, 409)
+    
+    # Create user
+    user = User(
+        username=data['username'],
+        email=data['email'],
+        first_name=data['first_name'],
+        last_name=data['last_name'],
+        phone=data.get('phone'),
+        is_verified=False  # Email verification would be implemented separately
+    )
+    user.set_password(data['password'])
+    
+    db.session.add(user)
+    
+    # Create company if provided
+    if company_data:
+        company = Company(
+            name=company_data['name'],
+            slug=company_slug,
+            description=company_data.get('description'),
+            email=company_data.get('email'),
+            phone=company_data.get('phone'),
+            address=company_data.get('address'),
+            subscription_plan='trial',  # Start with trial
+            subscription_status='active'
         )
-        user.set_password(data['password'])
-        
-        db.session.add(user)
-        db.session.flush()  # Get user ID
         
-        # Create company if provided
-        if company_data:
-            company = Company(
-                name=company_data['name'],
-                slug=company_slug,
-                description=company_data.get('description'),
-                email=company_data.get('email'),
-                phone=company_data.get('phone'),
-                address=company_data.get('address'),
-                subscription_plan='trial',  # Start with trial
-                subscription_status='active'
-            )
-            
-            db.session.add(company)
-            db.session.flush()  # Get company ID
-            
-            # Create company-user relationship with admin role
-            company_user = CompanyUser(
-                user_id=user.id,
-                company_id=company.id,
-                role='Company Admin',
-                can_manage_users=True,
-                can_manage_settings=True,
-                can_view_reports=True,
-                can_manage_billing=True,
-                joined_at=datetime.utcnow()
-            )
-            
-            db.session.add(company_user)
-            
-            # Create tenant schema for the new company
-            db_manager = current_app.extensions.get('database_manager')
-            if db_manager:
-                schema_created = db_manager.create_tenant_schema(company_slug)
-                if not schema_created:
-                    db.session.rollback()
-                    return jsonify({'error': 'Failed to create company workspace'}), 500
+        # Create company-user relationship with admin role; the unit of
+        # work inserts user, company and membership in dependency order
+        company_user = CompanyUser(
+            user=user,
+            company=company,
+            role='Company Admin',
+            permissions_mask=PERM_ALL,
+            joined_at=datetime.utcnow()
+        )
         
-        db.session.commit()
+        db.session.add(company_user)
+    
+    # The tenant schema is created in the background once the company
+    # row is committed; clients poll the status endpoint until it's ready
+    db_manager = current_app.extensions.get('database_manager')
+    if company_data and db_manager:
+        company.provisioning_status = 'pending'
+    
+    # The response is built between flush and commit: the flush assigns
+    # ids and defaults, and the commit would expire them all again
+    try:
+        db.session.flush()
         
-        # Prepare response
         response_data = {
-            'user': user.to_dict(),
+            'user': UserDTO.from_model(user),
             'message': 'User registered successfully'
         }
         
         if company_data:
-            response_data['company'] = company.to_dict()
+            company_id = company.id
+            response_data['company'] = CompanyDTO.from_model(company)
             response_data['message'] = 'User and company registered successfully'
         
-        return jsonify(response_data), 201
-        
-    except Exception as e:
-        logger.error(f"Registration error: {str(e)}")
+        db.session.commit()
+    except IntegrityError:
+        # Lost a race with a concurrent registration
         db.session.rollback()
-        return jsonify({'error': 'Internal server error'}), 500
+        return json_response({'error': 'User or company already exists'}, 409)
+    
+    if company_data and db_manager:
+        db_manager.provision_tenant_async(company_id, company_slug)
+    
+    return json_response(response_data, 201)
 
 
 @mt_auth_bp.route('/companies', methods=['GET'])
@@ -336,28 +387,18 @@ def register():
 @public_route
 def get_user_companies():
     """Get all companies the current user has access to."""
-    try:
-        user_id = get_jwt_identity()
-        
-        company_users = CompanyUser.query.filter_by(
-            user_id=user_id,
-            is_active=True
-        ).join(Company).filter(Company.is_active == True).all()
-        
-        companies = []
-        for cu in company_users:
-            company_data = cu.company.to_dict()
-            company_data['role'] = cu.role
-            company_data['permissions'] = cu.permissions
-            company_data['joined_at'] = cu.joined_at.isoformat() if cu.joined_at else None
-            company_data['last_access'] = cu.last_access.isoformat() if cu.last_access else None
-            companies.append(company_data)
-        
-        return jsonify({'companies': companies}), 200
-        
-    except Exception as e:
-        logger.error(f"Get companies error: {str(e)}")
-        return jsonify({'error': 'Internal server error'}), 500
+    user_id = get_jwt_identity()
+    
+    company_users = CompanyUser.query.filter_by(
+        user_id=user_id,
+        is_active=True
+    ).join(Company).filter(Company.is_active == True).options(
+        contains_eager(CompanyUser.company)
+    ).all()
+    
+    companies = [CompanyMembershipDTO.from_company_user(cu) for cu in company_users]
+    
+    return json_response({'companies': companies}, 200)
 
 
 @mt_auth_bp.route('/companies', methods=['POST'])
@@ -377,77 +418,99 @@ def create_company():
         "address": "456 Oak St, City, State 12345"
     }
     """
+    user_id = get_jwt_identity()
+    data = request.get_json()
+    
+    if not data or not data.get('name'):
+        return json_response({'error': 'Company name is required'}, 400)
+    
+    # Generate slug if not provided
+    if not data.get('slug'):
+        company_slug = generate_company_slug(data['name'])
+    else:
+        company_slug = data['slug']
+    
+    # Validate slug format
+    if not is_valid_slug(company_slug):
+        return json_response({'error': 'Invalid company slug format'}, 400)
+    
+    # Check if company slug already exists
+    if slug_exists(company_slug):
+        return json_response({'error': f'Company slug "{company_slug}" already exists'}, 409)
+    
+    # Create company
+    company = Company(
+        name=data['name'],
+        slug=company_slug,
+        description=data.get('description'),
+        email=data.get('email'),
+        phone=data.get('phone'),
+        address=data.get('address'),
+        subscription_plan='trial',
+        subscription_status='active'
+    )
+    
+    # Create company-user relationship with admin role
+    company_user = CompanyUser(
+        user_id=user_id,
+        company=company,
+        role='Company Admin',
+        permissions_mask=PERM_ALL,
+        joined_at=datetime.utcnow()
+    )
+    
+    db.session.add(company_user)
+    
+    # Tenant schema is created in the background after commit
+    db_manager = current_app.extensions.get('database_manager')
+    if db_manager:
+        company.provisioning_status = 'pending'
+    
+    # The response is built between flush and commit: the flush assigns
+    # ids and defaults, and the commit would expire them all again
     try:
-        user_id = get_jwt_identity()
-        data = request.get_json()
-        
-        if not data or not data.get('name'):
-            return jsonify({'error': 'Company name is required'}), 400
-        
-        # Generate slug if not provided
-        if not data.get('slug'):
-            company_slug = generate_company_slug(data['name'])
-        else:
-            company_slug = data['slug']
-        
-        # Validate slug format
-        if not is_valid_slug(company_slug):
-            return jsonify({'error': 'Invalid company slug format'}), 400
-        
-        # Check if company slug already exists
-        existing_company = Company.query.filter_by(slug=company_slug).first()
-        if existing_company:
-            return jsonify({'error': f'Company slug "{company_slug}" already exists'}), 409
-        
-        # Create company
-        company = Company(
-            name=data['name'],
-            slug=company_slug,
-            description=data.get('description'),
-            email=data.get('email'),
-            phone=data.get('phone'),
-            address=data.get('address'),
-            subscription_plan='trial',
-            subscription_status='active'
-        )
-        
-        db.session.add(company)
         db.session.flush()
         
-        # Create company-user relationship with admin role
-        company_user = CompanyUser(
-            user_id=user_id,
-            company_id=company.id,
-            role='Company Admin',
-            can_manage_users=True,
-            can_manage_settings=True,
-            can_view_reports=True,
-            can_manage_billing=True,
-            joined_at=datetime.utcnow()
-        )
-        
-        db.session.add(company_user)
-        
-        # Create tenant schema
-        db_manager = current_app.extensions.get('database_manager')
-        if db_manager:
-            schema_created = db_manager.create_tenant_schema(company_slug)
-            if not schema_created:
-                db.session.rollback()
-                return jsonify({'error': 'Failed to create company workspace'}), 500
-        
-        db.session.commit()
-        
-        return jsonify({
-            'company': company.to_dict(),
+        company_id = company.id
+        response_data = {
+            'company': CompanyDTO.from_model(company),
             'role': company_user.role,
             'message': 'Company created successfully'
-        }), 201
+        }
         
-    except Exception as e:
-        logger.error(f"Create company error: {str(e)}")
+        db.session.commit()
+    except IntegrityError:
+        # Slug was taken by a concurrent request since the check above
         db.session.rollback()
-        return jsonify({'error': 'Internal server error'}), 500
+        return json_response({'error': f'Company slug "{company_slug}" already exists'}, 409)
+    
+    if db_manager:
+        db_manager.provision_tenant_async(company_id, company_slug)
+    
+    return json_response(response_data, 201)
+
+
+@mt_auth_bp.route('/companies/<int:company_id>/status', methods=['GET'])
+@jwt_required()
+@public_route
+def get_company_status(company_id):
+    """Get the workspace provisioning status of a company the user belongs to."""
+    user_id = get_jwt_identity()
+    
+    company = Company.query.join(CompanyUser).filter(
+        Company.id == company_id,
+        CompanyUser.user_id == user_id,
+        CompanyUser.is_active == True
+    ).first()
+    
+    if not company:
+        return json_response({'error': 'Company not found'}, 404)
+    
+    return json_response({
+        'id': company.id,
+        'slug': company.slug,
+        'provisioning_status': company.provisioning_status
+    }, 200)
 
 
 def generate_company_slug(company_name):
@@ -460,25 +523,26 @@ def generate_company_slug(company_name):
     Returns:
         str: Generated slug
     """
-    # Convert to lowercase and replace spaces with hyphens
-    slug = company_name.lower().strip()
-    # Remove special characters except hyphens and alphanumeric
-    slug = re.sub(r'[^a-z0-9\-\s]', '', slug)
-    # Replace spaces with hyphens
-    slug = re.sub(r'\s+', '-', slug)
-    # Remove multiple consecutive hyphens
-    slug = re.sub(r'-+', '-', slug)
-    # Remove leading/trailing hyphens
-    slug = slug.strip('-')
-    
-    # Ensure uniqueness by appending number if needed
-    base_slug = slug
-    counter = 1
-    while Company.query.filter_by(slug=slug).first():
-        slug = f"{base_slug}-{counter}"
-        counter += 1
+    # Lowercase, collapse non-alphanumeric runs to hyphens and trim them
+    slug = _SLUG_CLEAN.sub('-', company_name.lower()).strip('-')
     
-    return slug
+    # Ensure uniqueness by appending number if needed, checking a whole
+    # batch of candidates per query instead of one round-trip each
+    base_slug = slug
+    start = 0
+    while True:
+        candidates = [
+            f"{base_slug}-{i}" if i else base_slug
+            for i in range(start, start + _SLUG_PROBE_BATCH)
+        ]
+        taken = {
+            existing for (existing,) in
+            db.session.query(Company.slug).filter(Company.slug.in_(candidates))
+        }
+        for candidate in candidates:
+            if candidate not in taken:
+                return candidate
+        start += _SLUG_PROBE_BATCH
 
 
 def is_valid_slug(slug):
@@ -494,29 +558,87 @@ def is_valid_slug(slug):
     if not slug or len(slug) < 2 or len(slug) > 50:
         return False
     
-    # Must contain only lowercase letters, numbers, and hyphens
-    # Cannot start or end with hyphen
-    pattern = r'^[a-z0-9]([a-z0-9\-]*[a-z0-9])?$'
-    return bool(re.match(pattern, slug))
+    return bool(_SLUG_VALID.match(slug))
+
+
+def slug_exists(slug):
+    """
+    Check whether a company already uses a slug.
+    
+    Args:
+        slug (str): Slug to look up
+        
+    Returns:
+        bool: True if the slug is taken, False otherwise
+    """
+    return db.session.query(exists().where(Company.slug == slug)).scalar()
+
+
+def check_login_password(username, user, password):
+    """
+    Check a login password, short-circuiting recently rejected attempts.
+    
+    The cache key covers the stored hash as well, so a password change
+    immediately invalidates any cached failures for that user. Attempts
+    against unknown usernames are verified against a dummy hash and cached
+    the same way, so neither path is distinguishable by timing.
+    
+    Args:
+        username (str): Submitted username or email
+        user (User): Matching user, or None if no account matched
+        password (str): Submitted password
+        
+    Returns:
+        bool: True if the password is correct, False otherwise
+    """
+    pepper = str(current_app.secret_key or '').encode()
+    password_hash = user.password_hash if user else ''
+    message = f"{username}:{password_hash}:{password}".encode()
+    key = hmac.new(pepper, message, hashlib.sha256).digest()
+    
+    with _failed_logins_lock:
+        if key in _failed_logins:
+            return False
+    
+    if user is None:
+        burn_password_check(password)
+    elif user.check_password(password):
+        return True
+    
+    with _failed_logins_lock:
+        _failed_logins[key] = True
+    return False
 
 
 # Error handlers for the blueprint
 @mt_auth_bp.errorhandler(400)
 def handle_bad_request(error):
-    return jsonify({'error': 'Bad request', 'message': str(error)}), 400
+    return json_response({'error': 'Bad request', 'message': str(error)}, 400)
 
 
 @mt_auth_bp.errorhandler(401)
 def handle_unauthorized(error):
-    return jsonify({'error': 'Unauthorized', 'message': 'Authentication required'}), 401
+    return json_response({'error': 'Unauthorized', 'message': 'Authentication required'}, 401)
 
 
 @mt_auth_bp.errorhandler(403)
 def handle_forbidden(error):
-    return jsonify({'error': 'Forbidden', 'message': 'Access denied'}), 403
+    return json_response({'error': 'Forbidden', 'message': 'Access denied'}, 403)
 
 
 @mt_auth_bp.errorhandler(409)
 def handle_conflict(error):
-    return jsonify({'error': 'Conflict', 'message': str(error)}), 409
+    return json_response({'error': 'Conflict', 'message': str(error)}, 409)
+
 
+@mt_auth_bp.errorhandler(500)
+def handle_internal_error(error):
+    """
+    Turn uncaught exceptions from this blueprint's views into a JSON 500.
+    
+    Flask only gets here for exceptions no other handler claims, so HTTP
+    errors and the token errors registered by Flask-JWT-Extended keep their
+    own responses. Flask has already logged the original exception.
+    """
+    db.session.rollback()
+    return json_response({'error': 'Internal server error'}, 500)
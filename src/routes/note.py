@@ -1,16 +1,29 @@
-from flask import Blueprint, jsonify, request, session
+from flask import Blueprint, Response, jsonify, request, stream_with_context
 from src.models.note import Note, NoteTemplate
 from src.models.user import User, db
-from src.routes.auth import login_required, admin_required
+from src.routes.auth import login_required, admin_required, current_user
+from src.utils.serialization import iter_json_array
+from sqlalchemy.orm import joinedload
+import orjson
 
 note_bp = Blueprint('note', __name__)
 
+# to_dict() only reads the author's username, so don't pull the whole user
+# row. The loader options are built per request: the mappers can't be
+# configured at import time, before every model module is loaded.
+
+def _note_list_options():
+    return (joinedload(Note.clinician).load_only(User.id, User.username),)
+
+def _template_list_options():
+    return (joinedload(NoteTemplate.creator).load_only(User.id, User.username),)
+
 @note_bp.route('/appointments/<int:appointment_id>/notes', methods=['POST'])
 @login_required
 def create_note(appointment_id):
     try:
         data = request.json
-        user = User.query.get(session['user_id'])
+        user = current_user()
         
         # Validate required fields
         if 'content' not in data:
@@ -36,10 +49,10 @@ def create_note(appointment_id):
 @login_required
 def get_appointment_notes(appointment_id):
     try:
-        user = User.query.get(session['user_id'])
+        user = current_user()
         
         # Base query
-        query = Note.query.filter_by(appointment_id=appointment_id)
+        query = Note.query.options(*_note_list_options()).filter_by(appointment_id=appointment_id)
         
         # Role-based filtering
         if user.role == 'Clinician':
@@ -60,7 +73,7 @@ def get_appointment_notes(appointment_id):
 def update_note(note_id):
     try:
         note = Note.query.get_or_404(note_id)
-        user = User.query.get(session['user_id'])
+        user = current_user()
         data = request.json
         
         # Check permissions - only the clinician who created the note can edit it
@@ -84,7 +97,7 @@ def update_note(note_id):
 def delete_note(note_id):
     try:
         note = Note.query.get_or_404(note_id)
-        user = User.query.get(session['user_id'])
+        user = current_user()
         
         # Check permissions
         if note.clinician_id != user.id and user.role != 'Admin':
@@ -101,13 +114,15 @@ def delete_note(note_id):
 @login_required
 def get_patient_notes(patient_id):
     try:
-        user = User.query.get(session['user_id'])
+        user = current_user()
         
         # Get all notes for appointments with this patient
         from src.models.appointment import Appointment
         
         # Base query - join notes with appointments to filter by patient
-        query = db.session.query(Note).join(Appointment).filter(Appointment.patient_id == patient_id)
+        query = db.session.query(Note).join(Appointment).options(*_note_list_options()).filter(
+            Appointment.patient_id == patient_id
+        )
         
         # Role-based filtering
         if user.role == 'Clinician':
@@ -124,7 +139,7 @@ def get_patient_notes(patient_id):
 @login_required
 def export_notes_pdf(appointment_id):
     try:
-        user = User.query.get(session['user_id'])
+        user = current_user()
         
         # Check permissions
         from src.models.appointment import Appointment
@@ -133,16 +148,27 @@ def export_notes_pdf(appointment_id):
         if user.role == 'Clinician' and appointment.clinician_id != user.id:
             return jsonify({'error': 'Access denied'}), 403
         
-        # Get notes for the appointment
-        notes = Note.query.filter_by(appointment_id=appointment_id).order_by(Note.created_at).all()
+        # Get notes for the appointment, fetched in batches as the
+        # response is written instead of all at once
+        notes = Note.query.options(*_note_list_options()).filter_by(
+            appointment_id=appointment_id
+        ).order_by(Note.created_at).yield_per(200)
         
         # In a real implementation, this would generate a PDF
         # For now, we'll return the notes data with a message
-        return jsonify({
+        head = {
             'message': 'PDF export functionality would be implemented here',
-            'appointment': appointment.to_dict(),
-            'notes': [note.to_dict() for note in notes]
-        })
+            'appointment': appointment.to_dict()
+        }
+        
+        def generate():
+            # Drop the closing brace of the head object and append the
+            # notes array as its last member
+            yield orjson.dumps(head)[:-1] + b',"notes":'
+            yield from iter_json_array(note.to_dict() for note in notes)
+            yield b'}'
+        
+        return Response(stream_with_context(generate()), mimetype='application/json')
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -152,7 +178,7 @@ def export_notes_pdf(appointment_id):
 @login_required
 def get_note_templates():
     try:
-        templates = NoteTemplate.query.filter_by(is_active=True).all()
+        templates = NoteTemplate.query.options(*_template_list_options()).filter_by(is_active=True).all()
         return jsonify([template.to_dict() for template in templates])
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -162,7 +188,7 @@ def get_note_templates():
 def create_note_template():
     try:
         data = request.json
-        user = User.query.get(session['user_id'])
+        user = current_user()
         
         # Validate required fields
         required_fields = ['name', 'content']
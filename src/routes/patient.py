@@ -4,19 +4,149 @@ Patient routes for the multi-tenant Physical Therapy Management System.
 This module handles all patient-related API endpoints within tenant contexts.
 """
 
-from flask import Blueprint, jsonify, request, g
-from src.models.patient import Patient
+from flask import Blueprint, Response, current_app, request, g, stream_with_context
+from src.models.patient import Patient, PATIENT_SEARCH_TEXT
 from src.models.client import Client
 from src.models.public import db
 from src.middleware.tenant import tenant_required, log_tenant_action, get_current_user_profile
+from src.utils.serialization import conditional_json_response, json_response, version_tag
+from sqlalchemy import func, tuple_
+from cachetools import TTLCache
 from datetime import datetime, date
 import logging
+import orjson
+import threading
 
 logger = logging.getLogger(__name__)
 
 # Create blueprint with tenant-aware URL prefix
 patient_bp = Blueprint('patient', __name__, url_prefix='/api/v1/tenants/<tenant_slug>')
 
+# Columns returned by the patient list view. List rows are serialized straight
+# from these rather than hydrating full Patient objects.
+PATIENT_LIST_COLUMNS = (
+    Patient.id, Patient.first_name, Patient.last_name, Patient.middle_name,
+    Patient.preferred_name, Patient.medical_record_number, Patient.date_of_birth,
+    Patient.gender, Patient.email, Patient.phone_primary, Patient.status,
+    Patient.client_id, Patient.primary_therapist_id,
+    Patient.therapy_start_date, Patient.therapy_end_date,
+    Patient.visits_completed, Patient.visits_remaining,
+    Patient.last_visit_date, Patient.next_appointment_date
+)
+PATIENT_LIST_KEYS = tuple(column.key for column in PATIENT_LIST_COLUMNS)
+
+
+def _patient_list_row_dict(row):
+    """Serialize a PATIENT_LIST_COLUMNS row without building a RowMapping."""
+    return dict(zip(PATIENT_LIST_KEYS, row))
+
+# Fields a client may set when creating a patient. Anything omitted falls
+# back to the column default.
+_PATIENT_CREATE_FIELDS = frozenset({
+    'first_name', 'last_name', 'middle_name', 'preferred_name',
+    'medical_record_number', 'ssn_last_four', 'gender', 'email',
+    'phone_primary', 'phone_secondary', 'preferred_contact_method',
+    'address_line1', 'address_line2', 'city', 'state', 'zip_code', 'country',
+    'latitude', 'longitude', 'emergency_contact_name', 'emergency_contact_relationship',
+    'emergency_contact_phone', 'primary_insurance', 'primary_insurance_id',
+    'primary_insurance_group', 'secondary_insurance', 'secondary_insurance_id',
+    'primary_diagnosis', 'secondary_diagnoses', 'icd10_codes',
+    'referring_physician', 'referring_physician_npi', 'frequency_per_week',
+    'total_visits_authorized', 'chief_complaint', 'medical_history',
+    'surgical_history', 'medications', 'allergies', 'precautions',
+    'contraindications', 'functional_limitations', 'goals_short_term',
+    'goals_long_term', 'prior_level_of_function', 'initial_pain_score',
+    'current_pain_score', 'outcome_measures', 'client_id',
+    'primary_therapist_id', 'care_team', 'preferred_appointment_days',
+    'preferred_appointment_times', 'scheduling_notes', 'language_preference',
+    'interpreter_needed', 'communication_notes', 'copay_amount',
+    'deductible_met', 'financial_responsibility', 'payment_plan', 'status'
+})
+
+# Fields a client may change on an existing patient
+_PATIENT_UPDATE_FIELDS = frozenset({
+    'first_name', 'last_name', 'middle_name', 'preferred_name',
+    'medical_record_number', 'ssn_last_four', 'gender',
+    'email', 'phone_primary', 'phone_secondary', 'preferred_contact_method',
+    'address_line1', 'address_line2', 'city', 'state', 'zip_code', 'country',
+    'latitude', 'longitude',
+    'emergency_contact_name', 'emergency_contact_relationship', 'emergency_contact_phone',
+    'primary_insurance', 'primary_insurance_id', 'primary_insurance_group',
+    'secondary_insurance', 'secondary_insurance_id',
+    'primary_diagnosis', 'secondary_diagnoses', 'icd10_codes',
+    'referring_physician', 'referring_physician_npi',
+    'frequency_per_week', 'total_visits_authorized',
+    'chief_complaint', 'medical_history', 'surgical_history',
+    'medications', 'allergies', 'precautions', 'contraindications',
+    'functional_limitations', 'goals_short_term', 'goals_long_term',
+    'prior_level_of_function', 'current_pain_score', 'outcome_measures',
+    'client_id', 'primary_therapist_id', 'care_team',
+    'preferred_appointment_days', 'preferred_appointment_times', 'scheduling_notes',
+    'language_preference', 'interpreter_needed', 'communication_notes',
+    'copay_amount', 'deductible_met', 'financial_responsibility', 'payment_plan',
+    'status', 'discharge_reason', 'discharge_summary',
+    'satisfaction_score', 'outcome_achieved', 'readmission_risk'
+})
+
+# Date fields accepted as YYYY-MM-DD strings on create/update
+_DATE_FIELDS = frozenset({'date_of_birth', 'therapy_start_date', 'therapy_end_date', 'discharge_date'})
+
+
+def _parse_dates(data):
+    """
+    Parse the date fields present in a request payload.
+    
+    Args:
+        data (dict): Request payload
+        
+    Returns:
+        dict: Field name to date, or None for fields explicitly set to null
+        
+    Raises:
+        ValueError: If a field is not a valid ISO date; the field name is
+            the exception's argument
+    """
+    parsed = {}
+    for field in data.keys() & _DATE_FIELDS:
+        value = data[field]
+        if value:
+            try:
+                parsed[field] = date.fromisoformat(value)
+            except (TypeError, ValueError):
+                raise ValueError(field) from None
+        elif value is None:
+            parsed[field] = None
+    return parsed
+
+
+# Stable list ordering; id breaks ties so keyset cursors are unambiguous
+PATIENT_LIST_ORDER = (Patient.last_name, Patient.first_name, Patient.id)
+
+# Recent list totals keyed by (tenant, status, client_id, search)
+_patient_counts = TTLCache(maxsize=1024, ttl=30)
+_patient_counts_lock = threading.Lock()
+
+
+def _count_patients(query, key):
+    """
+    Count the rows matched by a patient list query, reusing recent results.
+    
+    Args:
+        query: Filtered Patient query
+        key (tuple): Filter signature identifying the query
+        
+    Returns:
+        int: Number of matching patients
+    """
+    with _patient_counts_lock:
+        total = _patient_counts.get(key)
+    if total is None:
+        total = query.with_entities(func.count(Patient.id)).scalar()
+        with _patient_counts_lock:
+            _patient_counts[key] = total
+    return total
+
+
 @patient_bp.route('/patients', methods=['GET'])
 @tenant_required
 def get_patients(tenant_slug):
@@ -29,6 +159,9 @@ def get_patients(tenant_slug):
     - search: Search in patient names
     - page: Page number for pagination
     - per_page: Items per page (default 50, max 100)
+    - count: Set to false to skip computing total/pages
+    - after_last_name, after_first_name, after_id: Keyset cursor; returns the
+      page following this row instead of using page (see pagination.next_after)
     """
     try:
         query = Patient.query.filter_by(is_active=True)
@@ -44,46 +177,95 @@ def get_patients(tenant_slug):
         
         search = request.args.get('search')
         if search:
-            search_term = f"%{search}%"
-            query = query.filter(
-                (Patient.first_name.ilike(search_term)) |
-                (Patient.last_name.ilike(search_term)) |
-                (Patient.medical_record_number.ilike(search_term))
-            )
+            query = query.filter(PATIENT_SEARCH_TEXT.ilike(f"%{search}%"))
         
         # Pagination
-        page = request.args.get('page', 1, type=int)
+        page = max(request.args.get('page', 1, type=int), 1)
         per_page = min(request.args.get('per_page', 50, type=int), 100)
+        with_count = request.args.get('count', 'true').lower() != 'false'
+        after_id = request.args.get('after_id', type=int)
         
-        patients_paginated = query.order_by(Patient.last_name, Patient.first_name).paginate(
-            page=page, per_page=per_page, error_out=False
-        )
+        # Total is cached briefly per filter combination so paging through
+        # a list doesn't rerun COUNT(*) for every page
+        total = None
+        if with_count and after_id is None:
+            total = _count_patients(query, (tenant_slug, status, client_id, search))
         
-        # Include relationships if requested
+        # Include relationships if requested; otherwise only the list columns
+        # are selected and no Patient objects are built
         include_relationships = request.args.get('include_relationships', 'false').lower() == 'true'
-        
-        patients_data = [
-            patient.to_dict(include_relationships=include_relationships) 
-            for patient in patients_paginated.items
-        ]
+        list_query = query if include_relationships else query.with_entities(*PATIENT_LIST_COLUMNS)
+        
+        if after_id is not None:
+            # Keyset pagination: seek past the cursor row instead of
+            # scanning and discarding OFFSET rows
+            list_query = list_query.filter(
+                tuple_(Patient.last_name, Patient.first_name, Patient.id) > (
+                    request.args.get('after_last_name', ''),
+                    request.args.get('after_first_name', ''),
+                    after_id
+                )
+            )
+            offset = 0
+        else:
+            offset = (page - 1) * per_page
         
         log_tenant_action('view', 'patients', description=f"Viewed patients list (page {page})")
         
-        return jsonify({
-            'patients': patients_data,
-            'pagination': {
-                'page': page,
-                'per_page': per_page,
-                'total': patients_paginated.total,
-                'pages': patients_paginated.pages,
-                'has_next': patients_paginated.has_next,
-                'has_prev': patients_paginated.has_prev
-            }
-        }), 200
+        # Fetch one extra row to learn whether there is a next page
+        rows = list_query.order_by(*PATIENT_LIST_ORDER).offset(offset).limit(per_page + 1).yield_per(25)
+        has_prev = after_id is not None or page > 1
+        pages = -(-total // per_page) if total is not None else None
+        db_manager = current_app.extensions.get('database_manager')
+        
+        def generate():
+            # Rows are fetched and serialized as the body is written, which
+            # happens after tenant_required has reset the schema
+            if db_manager:
+                db_manager.switch_schema(tenant_slug)
+            try:
+                yield b'{"patients":['
+                count = 0
+                last = None
+                has_next = False
+                for row in rows:
+                    if count == per_page:
+                        has_next = True
+                        break
+                    if include_relationships:
+                        data = row.to_dict(include_relationships=True)
+                    else:
+                        data = _patient_list_row_dict(row)
+                    yield (b',' if count else b'') + orjson.dumps(data)
+                    count += 1
+                    last = row
+                
+                next_after = None
+                if has_next:
+                    next_after = {
+                        'after_last_name': last.last_name,
+                        'after_first_name': last.first_name,
+                        'after_id': last.id
+                    }
+                
+                yield b'],"pagination":' + orjson.dumps({
+                    'page': page,
+                    'per_page': per_page,
+                    'total': total,
+                    'pages': pages,
+                    'has_next': has_next,
+                    'has_prev': has_prev,
+                    'next_after': next_after
+                }) + b'}'
+            finally:
+                if db_manager:
+                    db_manager.reset_schema()
+        
+        return Response(stream_with_context(generate()), mimetype='application/json')
         
     except Exception as e:
         logger.error(f"Error getting patients: {str(e)}")
-        return jsonify({'error': 'Internal server error'}), 500
+        return json_response({'error': 'Internal server error'}, 500)
 
 
 @patient_bp.route('/patients', methods=['POST'])
@@ -98,114 +280,51 @@ def create_patient(tenant_slug):
     try:
         data = request.get_json()
         if not data:
-            return jsonify({'error': 'No data provided'}), 400
+            return json_response({'error': 'No data provided'}, 400)
         
         # Validate required fields
         required_fields = ['first_name', 'last_name']
         for field in required_fields:
             if not data.get(field):
-                return jsonify({'error': f'{field} is required'}), 400
+                return json_response({'error': f'{field} is required'}, 400)
         
         # Validate client_id if provided
         if data.get('client_id'):
             client = Client.query.get(data['client_id'])
             if not client or not client.is_active:
-                return jsonify({'error': 'Invalid client ID'}), 400
-        
-        # Validate date fields
-        date_fields = ['date_of_birth', 'therapy_start_date', 'therapy_end_date', 'discharge_date']
-        for field in date_fields:
-            if data.get(field):
-                try:
-                    datetime.strptime(data[field], '%Y-%m-%d').date()
-                except ValueError:
-                    return jsonify({'error': f'Invalid date format for {field}. Use YYYY-MM-DD'}), 400
-        
-        # Create patient
-        patient = Patient(
-            first_name=data['first_name'],
-            last_name=data['last_name'],
-            middle_name=data.get('middle_name'),
-            preferred_name=data.get('preferred_name'),
-            medical_record_number=data.get('medical_record_number'),
-            ssn_last_four=data.get('ssn_last_four'),
-            date_of_birth=datetime.strptime(data['date_of_birth'], '%Y-%m-%d').date() if data.get('date_of_birth') else None,
-            gender=data.get('gender'),
-            email=data.get('email'),
-            phone_primary=data.get('phone_primary'),
-            phone_secondary=data.get('phone_secondary'),
-            preferred_contact_method=data.get('preferred_contact_method', 'Phone'),
-            address_line1=data.get('address_line1'),
-            address_line2=data.get('address_line2'),
-            city=data.get('city'),
-            state=data.get('state'),
-            zip_code=data.get('zip_code'),
-            country=data.get('country', 'USA'),
-            emergency_contact_name=data.get('emergency_contact_name'),
-            emergency_contact_relationship=data.get('emergency_contact_relationship'),
-            emergency_contact_phone=data.get('emergency_contact_phone'),
-            primary_insurance=data.get('primary_insurance'),
-            primary_insurance_id=data.get('primary_insurance_id'),
-            primary_insurance_group=data.get('primary_insurance_group'),
-            secondary_insurance=data.get('secondary_insurance'),
-            secondary_insurance_id=data.get('secondary_insurance_id'),
-            primary_diagnosis=data.get('primary_diagnosis'),
-            secondary_diagnoses=data.get('secondary_diagnoses'),
-            icd10_codes=data.get('icd10_codes'),
-            referring_physician=data.get('referring_physician'),
-            referring_physician_npi=data.get('referring_physician_npi'),
-            therapy_start_date=datetime.strptime(data['therapy_start_date'], '%Y-%m-%d').date() if data.get('therapy_start_date') else None,
-            therapy_end_date=datetime.strptime(data['therapy_end_date'], '%Y-%m-%d').date() if data.get('therapy_end_date') else None,
-            frequency_per_week=data.get('frequency_per_week', 2),
-            total_visits_authorized=data.get('total_visits_authorized'),
-            chief_complaint=data.get('chief_complaint'),
-            medical_history=data.get('medical_history'),
-            surgical_history=data.get('surgical_history'),
-            medications=data.get('medications'),
-            allergies=data.get('allergies'),
-            precautions=data.get('precautions'),
-            contraindications=data.get('contraindications'),
-            functional_limitations=data.get('functional_limitations'),
-            goals_short_term=data.get('goals_short_term'),
-            goals_long_term=data.get('goals_long_term'),
-            prior_level_of_function=data.get('prior_level_of_function'),
-            initial_pain_score=data.get('initial_pain_score'),
-            current_pain_score=data.get('current_pain_score'),
-            outcome_measures=data.get('outcome_measures'),
-            client_id=data.get('client_id'),
-            primary_therapist_id=data.get('primary_therapist_id'),
-            care_team=data.get('care_team'),
-            preferred_appointment_days=data.get('preferred_appointment_days'),
-            preferred_appointment_times=data.get('preferred_appointment_times'),
-            scheduling_notes=data.get('scheduling_notes'),
-            language_preference=data.get('language_preference', 'English'),
-            interpreter_needed=data.get('interpreter_needed', False),
-            communication_notes=data.get('communication_notes'),
-            copay_amount=data.get('copay_amount'),
-            deductible_met=data.get('deductible_met', False),
-            financial_responsibility=data.get('financial_responsibility'),
-            payment_plan=data.get('payment_plan'),
-            status=data.get('status', 'Active'),
-            created_by=g.current_user_id
-        )
+                return json_response({'error': 'Invalid client ID'}, 400)
+        
+        # Validate and parse date fields
+        try:
+            dates = _parse_dates(data)
+        except ValueError as e:
+            return json_response({'error': f'Invalid date format for {e}. Use YYYY-MM-DD'}, 400)
+        
+        # Create patient from the whitelisted fields present in the payload
+        kwargs = {field: data[field] for field in _PATIENT_CREATE_FIELDS & data.keys()}
+        kwargs.update(dates)
+        patient = Patient(**kwargs, created_by=g.current_user_id)
         
         db.session.add(patient)
         db.session.commit()
         
+        # Serialize once for both the audit log and the response
+        patient_data = patient.to_dict(include_relationships=True)
+        
         log_tenant_action(
             'create', 
             'patient', 
             resource_id=patient.id,
             description=f"Created patient {patient.full_name}",
-            new_values=patient.to_dict()
+            new_values=patient_data
         )
         
-        return jsonify(patient.to_dict(include_relationships=True)), 201
+        return json_response(patient_data, 201)
         
     except Exception as e:
         logger.error(f"Error creating patient: {str(e)}")
         db.session.rollback()
-        return jsonify({'error': 'Internal server error'}), 500
+        return json_response({'error': 'Internal server error'}, 500)
 
 
 @patient_bp.route('/patients/<int:patient_id>', methods=['GET'])
@@ -216,7 +335,7 @@ def get_patient(tenant_slug, patient_id):
         patient = Patient.query.get_or_404(patient_id)
         
         if not patient.is_active:
-            return jsonify({'error': 'Patient not found'}), 404
+            return json_response({'error': 'Patient not found'}, 404)
         
         include_relationships = request.args.get('include_relationships', 'true').lower() == 'true'
         
@@ -227,11 +346,24 @@ def get_patient(tenant_slug, patient_id):
             description=f"Viewed patient {patient.full_name}"
         )
         
-        return jsonify(patient.to_dict(include_relationships=include_relationships)), 200
+        # The bare record can be validated against updated_at without
+        # building it
+        if not include_relationships:
+            return conditional_json_response(
+                f"patient-{patient.id}-{version_tag(patient.updated_at)}",
+                patient.to_dict
+            )
+        
+        # Related records change without touching the patient row, and the
+        # recent and upcoming appointments shift with the clock, so the full
+        # record is tagged from its encoded body instead
+        response = json_response(patient.to_dict(include_relationships=True), 200)
+        response.add_etag(weak=True)
+        return response.make_conditional(request)
         
     except Exception as e:
         logger.error(f"Error getting patient {patient_id}: {str(e)}")
-        return jsonify({'error': 'Internal server error'}), 500
+        return json_response({'error': 'Internal server error'}, 500)
 
 
 @patient_bp.route('/patients/<int:patient_id>', methods=['PUT'])
@@ -242,56 +374,38 @@ def update_patient(tenant_slug, patient_id):
         patient = Patient.query.get_or_404(patient_id)
         
         if not patient.is_active:
-            return jsonify({'error': 'Patient not found'}), 404
+            return json_response({'error': 'Patient not found'}, 404)
         
         data = request.get_json()
         if not data:
-            return jsonify({'error': 'No data provided'}), 400
-        
-        # Store old values for audit log
-        old_values = patient.to_dict()
-        
-        # Update fields
-        updatable_fields = [
-            'first_name', 'last_name', 'middle_name', 'preferred_name',
-            'medical_record_number', 'ssn_last_four', 'gender',
-            'email', 'phone_primary', 'phone_secondary', 'preferred_contact_method',
-            'address_line1', 'address_line2', 'city', 'state', 'zip_code', 'country',
-            'emergency_contact_name', 'emergency_contact_relationship', 'emergency_contact_phone',
-            'primary_insurance', 'primary_insurance_id', 'primary_insurance_group',
-            'secondary_insurance', 'secondary_insurance_id',
-            'primary_diagnosis', 'secondary_diagnoses', 'icd10_codes',
-            'referring_physician', 'referring_physician_npi',
-            'frequency_per_week', 'total_visits_authorized',
-            'chief_complaint', 'medical_history', 'surgical_history',
-            'medications', 'allergies', 'precautions', 'contraindications',
-            'functional_limitations', 'goals_short_term', 'goals_long_term',
-            'prior_level_of_function', 'current_pain_score', 'outcome_measures',
-            'client_id', 'primary_therapist_id', 'care_team',
-            'preferred_appointment_days', 'preferred_appointment_times', 'scheduling_notes',
-            'language_preference', 'interpreter_needed', 'communication_notes',
-            'copay_amount', 'deductible_met', 'financial_responsibility', 'payment_plan',
-            'status', 'discharge_reason', 'discharge_summary',
-            'satisfaction_score', 'outcome_achieved', 'readmission_risk'
-        ]
-        
-        for field in updatable_fields:
-            if field in data:
-                setattr(patient, field, data[field])
-        
-        # Handle date fields
-        date_fields = ['date_of_birth', 'therapy_start_date', 'therapy_end_date', 'discharge_date']
-        for field in date_fields:
-            if field in data and data[field]:
-                try:
-                    setattr(patient, field, datetime.strptime(data[field], '%Y-%m-%d').date())
-                except ValueError:
-                    return jsonify({'error': f'Invalid date format for {field}. Use YYYY-MM-DD'}), 400
-            elif field in data and data[field] is None:
-                setattr(patient, field, None)
+            return json_response({'error': 'No data provided'}, 400)
+        
+        try:
+            dates = _parse_dates(data)
+        except ValueError as e:
+            return json_response({'error': f'Invalid date format for {e}. Use YYYY-MM-DD'}, 400)
+        
+        requested = {field: data[field] for field in data.keys() & _PATIENT_UPDATE_FIELDS}
+        requested.update(dates)
+        
+        # Keep only the values that actually differ from what is stored
+        old_values = {}
+        changes = {}
+        for field, value in requested.items():
+            current = getattr(patient, field)
+            if current != value:
+                old_values[field] = current
+                changes[field] = value
+        
+        # Nothing to write: skip the commit and the audit entry
+        if not changes:
+            return json_response(patient.to_dict(include_relationships=True), 200)
+        
+        for field, value in changes.items():
+            setattr(patient, field, value)
         
         # Update visit counts if needed
-        if 'total_visits_authorized' in data:
+        if 'total_visits_authorized' in changes:
             patient.update_visit_counts()
         
         patient.updated_at = datetime.utcnow()
@@ -303,15 +417,15 @@ def update_patient(tenant_slug, patient_id):
             resource_id=patient.id,
             description=f"Updated patient {patient.full_name}",
             old_values=old_values,
-            new_values=patient.to_dict()
+            new_values={field: getattr(patient, field) for field in changes}
         )
         
-        return jsonify(patient.to_dict(include_relationships=True)), 200
+        return json_response(patient.to_dict(include_relationships=True), 200)
         
     except Exception as e:
         logger.error(f"Error updating patient {patient_id}: {str(e)}")
         db.session.rollback()
-        return jsonify({'error': 'Internal server error'}), 500
+        return json_response({'error': 'Internal server error'}, 500)
 
 
 @patient_bp.route('/patients/<int:patient_id>', methods=['DELETE'])
@@ -322,7 +436,7 @@ def delete_patient(tenant_slug, patient_id):
         patient = Patient.query.get_or_404(patient_id)
         
         if not patient.is_active:
-            return jsonify({'error': 'Patient not found'}), 404
+            return json_response({'error': 'Patient not found'}, 404)
         
         # Soft delete
         patient.is_active = False
@@ -336,12 +450,12 @@ def delete_patient(tenant_slug, patient_id):
             description=f"Deleted patient {patient.full_name}"
         )
         
-        return jsonify({'message': 'Patient deleted successfully'}), 200
+        return json_response({'message': 'Patient deleted successfully'}, 200)
         
     except Exception as e:
         logger.error(f"Error deleting patient {patient_id}: {str(e)}")
         db.session.rollback()
-        return jsonify({'error': 'Internal server error'}), 500
+        return json_response({'error': 'Internal server error'}, 500)
 
 
 @patient_bp.route('/patients/<int:patient_id>/discharge', methods=['POST'])
@@ -363,18 +477,18 @@ def discharge_patient(tenant_slug, patient_id):
         patient = Patient.query.get_or_404(patient_id)
         
         if not patient.is_active:
-            return jsonify({'error': 'Patient not found'}), 404
+            return json_response({'error': 'Patient not found'}, 404)
         
         data = request.get_json()
         if not data:
-            return jsonify({'error': 'No data provided'}), 400
+            return json_response({'error': 'No data provided'}, 400)
         
         # Update discharge information
         if data.get('discharge_date'):
             try:
-                patient.discharge_date = datetime.strptime(data['discharge_date'], '%Y-%m-%d').date()
-            except ValueError:
-                return jsonify({'error': 'Invalid discharge date format. Use YYYY-MM-DD'}), 400
+                patient.discharge_date = date.fromisoformat(data['discharge_date'])
+            except (TypeError, ValueError):
+                return json_response({'error': 'Invalid discharge date format. Use YYYY-MM-DD'}, 400)
         else:
             patient.discharge_date = date.today()
         
@@ -393,30 +507,30 @@ def discharge_patient(tenant_slug, patient_id):
             resource_id=patient.id,
             description=f"Discharged patient {patient.full_name}",
             new_values={
-                'discharge_date': patient.discharge_date.isoformat() if patient.discharge_date else None,
+                'discharge_date': patient.discharge_date,
                 'discharge_reason': patient.discharge_reason,
                 'status': patient.status
             }
         )
         
-        return jsonify({
+        return json_response({
             'message': 'Patient discharged successfully',
             'patient': patient.to_dict()
-        }), 200
+        }, 200)
         
     except Exception as e:
         logger.error(f"Error discharging patient {patient_id}: {str(e)}")
         db.session.rollback()
-        return jsonify({'error': 'Internal server error'}), 500
+        return json_response({'error': 'Internal server error'}, 500)
 
 
 # Error handlers for the blueprint
 @patient_bp.errorhandler(404)
 def handle_not_found(error):
-    return jsonify({'error': 'Patient not found'}), 404
+    return json_response({'error': 'Patient not found'}, 404)
 
 
 @patient_bp.errorhandler(400)
 def handle_bad_request(error):
-    return jsonify({'error': 'Bad request', 'message': str(error)}), 400
+    return json_response({'error': 'Bad request', 'message': str(error)}, 400)
 
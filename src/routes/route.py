@@ -1,44 +1,146 @@
-from flask import Blueprint, jsonify, request, session
+from flask import Blueprint, abort, request
 from src.models.route import Route, RouteStop
 from src.models.appointment import Appointment
 from src.models.patient import Patient
 from src.models.user import User, db
-from src.routes.auth import login_required, admin_required
-from datetime import datetime, date
+from src.routes.auth import login_required, admin_required, current_user
+from src.utils.cache import cached_json_response, invalidate_cached_responses
+from src.utils.serialization import conditional_json_response, json_response, version_tag
+from src.utils.routing import nearest_neighbor_order, travel_minutes
+from sqlalchemy import cast, func, literal_column, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.orm import contains_eager, joinedload, selectinload
+from datetime import datetime, date, time, timedelta
 import dateutil.parser
 
 route_bp = Blueprint('route', __name__)
 
+_DAY_START = time.min
+_ONE_DAY = timedelta(days=1)
+
+def _routes_with_stops():
+    """
+    Route query that loads each route's ordered stops, their appointments and
+    patients in the same statement. Use .all() rather than .first(), since a
+    LIMIT would cut the joined stop rows short.
+    """
+    return Route.query.outerjoin(Route.route_stops).options(
+        contains_eager(Route.route_stops)
+            .joinedload(RouteStop.appointment)
+            .joinedload(Appointment.patient),
+        joinedload(Route.clinician).load_only(User.id, User.username)
+    ).order_by(Route.id, RouteStop.stop_order)
+
+def _route_with_stops_dict(route):
+    route_data = route.to_dict()
+    route_data['stops'] = [stop.to_dict() for stop in route.route_stops]
+    return route_data
+
+def _route_with_stops_rows(*criteria):
+    """
+    Routes matching criteria, shaped like _route_with_stops_dict(), with
+    PostgreSQL assembling each route's ordered stops as JSON so no ORM
+    objects are built.
+    """
+    stop = func.json_build_object(
+        'id', RouteStop.id,
+        'route_id', RouteStop.route_id,
+        'appointment_id', RouteStop.appointment_id,
+        'stop_order', RouteStop.stop_order,
+        'visit_notes', RouteStop.visit_notes,
+        'arrival_time', RouteStop.arrival_time,
+        'departure_time', RouteStop.departure_time,
+        'status', RouteStop.status,
+        'patient_name', func.concat_ws(' ', Patient.first_name, Patient.middle_name, Patient.last_name),
+        'patient_address', Patient.address_line1,
+        'patient_phone', Patient.phone_primary
+    )
+    stops = func.coalesce(
+        func.json_agg(aggregate_order_by(stop, RouteStop.stop_order)).filter(RouteStop.id.isnot(None)),
+        literal_column("'[]'::json"),
+        type_=db.JSON
+    )
+    
+    query = (
+        select(
+            Route.id, Route.clinician_id, User.username.label('clinician_name'), Route.route_date,
+            cast(Route.optimized_path, db.JSON).label('optimized_path'),
+            Route.total_distance, Route.estimated_duration, Route.status,
+            Route.created_at, Route.updated_at, stops.label('stops')
+        )
+        .outerjoin(User, User.id == Route.clinician_id)
+        .outerjoin(RouteStop, RouteStop.route_id == Route.id)
+        .outerjoin(Appointment, Appointment.id == RouteStop.appointment_id)
+        .outerjoin(Patient, Patient.id == Appointment.patient_id)
+        .where(*criteria)
+        .group_by(Route.id, User.username)
+        .order_by(Route.id)
+    )
+    
+    return [dict(row._mapping) for row in db.session.execute(query)]
+
+def _load_routes_with_stops(*criteria):
+    """Routes matching criteria, serialized with their stops."""
+    if db.engine.dialect.name == 'postgresql':
+        return _route_with_stops_rows(*criteria)
+    return [_route_with_stops_dict(route) for route in _routes_with_stops().filter(*criteria).all()]
+
+# Cached route listings are keyed by the user's current role, read through
+# current_user() so a role change applies at once and the view reuses the
+# lookup. A clinician's own listings and the admin-wide ones are cached
+# separately.
+
+def _today_routes_key():
+    user = current_user()
+    if not user:
+        return None  # let the view refuse it
+    clinician_id = user.id if user.role == 'Clinician' else None
+    return ('routes_today', date.today(), clinician_id)
+
+def _clinician_routes_key(clinician_id):
+    user = current_user()
+    if not user or (user.role == 'Clinician' and user.id != clinician_id):
+        return None  # let the view refuse it
+    return ('clinician_routes', clinician_id, request.args.get('start_date'), request.args.get('end_date'))
+
+def _invalidate_route_listings(clinician_id, route_date):
+    """Drop cached listings that may include the given clinician's route."""
+    invalidate_cached_responses(('routes_today', route_date, clinician_id))
+    invalidate_cached_responses(('routes_today', route_date, None))
+    invalidate_cached_responses(('clinician_routes', clinician_id))
+
 @route_bp.route('/routes/optimize', methods=['POST'])
 @login_required
 def optimize_route():
     try:
         data = request.json
-        user = User.query.get(session['user_id'])
+        user = current_user()
         
         # Validate required fields
         required_fields = ['clinician_id', 'route_date']
         for field in required_fields:
             if field not in data:
-                return jsonify({'error': f'{field} is required'}), 400
+                return json_response({'error': f'{field} is required'}, 400)
         
         clinician_id = data['clinician_id']
         route_date = dateutil.parser.parse(data['route_date']).date()
         
         # Check permissions
         if user.role == 'Clinician' and user.id != clinician_id:
-            return jsonify({'error': 'Access denied'}), 403
+            return json_response({'error': 'Access denied'}, 403)
         
-        # Get appointments for the clinician on the specified date
-        appointments = Appointment.query.filter(
+        # Get appointments for the clinician on the specified date, as a
+        # half-open [midnight, next midnight) range
+        day_start = datetime.combine(route_date, _DAY_START)
+        appointments = Appointment.query.options(selectinload(Appointment.patient)).filter(
             Appointment.clinician_id == clinician_id,
-            Appointment.start_time >= datetime.combine(route_date, datetime.min.time()),
-            Appointment.start_time < datetime.combine(route_date, datetime.max.time()),
+            Appointment.start_time >= day_start,
+            Appointment.start_time < day_start + _ONE_DAY,
             Appointment.status == 'scheduled'
         ).order_by(Appointment.start_time).all()
         
         if not appointments:
-            return jsonify({'error': 'No appointments found for the specified date'}), 404
+            return json_response({'error': 'No appointments found for the specified date'}, 404)
         
         # Check if route already exists
         existing_route = Route.query.filter_by(
@@ -50,7 +152,7 @@ def optimize_route():
             # Update existing route
             route = existing_route
             # Clear existing stops
-            RouteStop.query.filter_by(route_id=route.id).delete()
+            RouteStop.query.filter_by(route_id=route.id).delete(synchronize_session=False)
         else:
             # Create new route
             route = Route(
@@ -60,7 +162,18 @@ def optimize_route():
             db.session.add(route)
             db.session.flush()  # Get the route ID
         
-        # Create optimized route (simplified algorithm - in reality would use mapping APIs)
+        # Visits keep their scheduled order. When every patient has
+        # coordinates, appointments sharing a start time are ordered by
+        # nearest neighbor and legs use real distances; otherwise assume 5
+        # miles between appointments (simplified - in reality would use
+        # mapping APIs).
+        coords = [(a.patient.latitude, a.patient.longitude) for a in appointments]
+        if all(lat is not None and lon is not None for lat, lon in coords):
+            order, legs = nearest_neighbor_order(coords, windows=[a.start_time for a in appointments])
+            appointments = [appointments[i] for i in order]
+        else:
+            legs = [5] * (len(appointments) - 1)
+        
         total_distance = 0
         estimated_duration = 0
         route_stops = []
@@ -74,31 +187,34 @@ def optimize_route():
                 arrival_time=appointment.start_time,
                 departure_time=appointment.end_time
             )
-            db.session.add(stop)
             route_stops.append(stop)
             
             # Estimate duration (simplified - would use real mapping data)
             estimated_duration += 60  # 60 minutes per appointment
             if i > 0:
-                estimated_duration += 15  # 15 minutes travel time between appointments
-                total_distance += 5  # 5 miles between appointments (simplified)
+                estimated_duration += travel_minutes(legs[i - 1])
+                total_distance += legs[i - 1]
+        
+        # Insert all stops in one executemany; nothing below needs their IDs
+        db.session.bulk_save_objects(route_stops)
         
         # Update route with calculated values
         route.total_distance = total_distance
         route.estimated_duration = estimated_duration
         
-        # Create optimized path data (simplified)
+        # Create optimized path data (simplified). Stops line up with the
+        # appointments they were built from, whose patients are already loaded.
         optimized_path = {
             'stops': [
                 {
                     'order': stop.stop_order,
                     'appointment_id': stop.appointment_id,
-                    'patient_name': stop.appointment.patient.name,
-                    'address': stop.appointment.patient.address,
-                    'arrival_time': stop.arrival_time.isoformat(),
-                    'departure_time': stop.departure_time.isoformat()
+                    'patient_name': appointment.patient.full_name,
+                    'address': appointment.patient.address_line1,
+                    'arrival_time': stop.arrival_time,
+                    'departure_time': stop.departure_time
                 }
-                for stop in route_stops
+                for stop, appointment in zip(route_stops, appointments)
             ],
             'total_distance': total_distance,
             'estimated_duration': estimated_duration
@@ -107,86 +223,110 @@ def optimize_route():
         route.set_optimized_path(optimized_path)
         
         db.session.commit()
+        _invalidate_route_listings(route.clinician_id, route.route_date)
         
-        return jsonify(route.to_dict()), 201
+        return json_response(route.to_dict(), 201)
         
     except Exception as e:
         db.session.rollback()
-        return jsonify({'error': str(e)}), 500
+        return json_response({'error': str(e)}, 500)
 
 @route_bp.route('/routes/<int:route_id>', methods=['GET'])
 @login_required
 def get_route(route_id):
     try:
-        route = Route.query.get_or_404(route_id)
-        user = User.query.get(session['user_id'])
+        # Read just enough to authorize the request and version the route
+        version = db.session.execute(
+            select(
+                Route.clinician_id,
+                Route.updated_at,
+                func.max(RouteStop.updated_at).label('stops_updated_at'),
+                func.count(RouteStop.id).label('stop_count')
+            )
+            .outerjoin(RouteStop, RouteStop.route_id == Route.id)
+            .where(Route.id == route_id)
+            .group_by(Route.id)
+        ).first()
+        if version is None:
+            abort(404)
+        user = current_user()
         
         # Check permissions
-        if user.role == 'Clinician' and route.clinician_id != user.id:
-            return jsonify({'error': 'Access denied'}), 403
+        if user.role == 'Clinician' and version.clinician_id != user.id:
+            return json_response({'error': 'Access denied'}, 403)
         
-        # Get route stops with appointment and patient details
-        stops = RouteStop.query.filter_by(route_id=route_id).order_by(RouteStop.stop_order).all()
+        # The route is current as of its most recently modified row; the stop
+        # count catches stops removed without touching the rest
+        last_modified = max(version.updated_at, version.stops_updated_at, key=version_tag)
+        etag = f"route-{route_id}-{version.stop_count}-{version_tag(last_modified)}"
         
-        route_data = route.to_dict()
-        route_data['stops'] = [stop.to_dict() for stop in stops]
-        
-        return jsonify(route_data)
+        return conditional_json_response(etag, lambda: _load_routes_with_stops(Route.id == route_id)[0])
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return json_response({'error': str(e)}, 500)
 
 @route_bp.route('/routes/<int:route_id>/notes', methods=['PUT'])
 @login_required
 def update_route_notes(route_id):
     try:
         route = Route.query.get_or_404(route_id)
-        user = User.query.get(session['user_id'])
+        user = current_user()
         data = request.json
         
         # Check permissions
         if user.role == 'Clinician' and route.clinician_id != user.id:
-            return jsonify({'error': 'Access denied'}), 403
+            return json_response({'error': 'Access denied'}, 403)
         
-        # Update notes for specific stops
+        # Update notes for specific stops, ignoring any that belong to
+        # another route
         if 'stop_notes' in data:
-            for stop_data in data['stop_notes']:
-                if 'stop_id' in stop_data and 'notes' in stop_data:
-                    stop = RouteStop.query.filter_by(
-                        id=stop_data['stop_id'],
-                        route_id=route_id
-                    ).first()
-                    
-                    if stop:
-                        stop.visit_notes = stop_data['notes']
+            notes = {
+                stop_data['stop_id']: stop_data['notes']
+                for stop_data in data['stop_notes']
+                if 'stop_id' in stop_data and 'notes' in stop_data
+            }
+            
+            if notes:
+                stop_ids = db.session.scalars(
+                    select(RouteStop.id).where(
+                        RouteStop.route_id == route_id,
+                        RouteStop.id.in_(notes)
+                    )
+                ).all()
+                
+                db.session.bulk_update_mappings(RouteStop, [
+                    {'id': stop_id, 'visit_notes': notes[stop_id]}
+                    for stop_id in stop_ids
+                ])
         
         db.session.commit()
-        return jsonify({'message': 'Notes updated successfully'})
+        _invalidate_route_listings(route.clinician_id, route.route_date)
+        return json_response({'message': 'Notes updated successfully'})
         
     except Exception as e:
         db.session.rollback()
-        return jsonify({'error': str(e)}), 500
+        return json_response({'error': str(e)}, 500)
 
 @route_bp.route('/routes/<int:route_id>/stops/<int:stop_id>/status', methods=['PUT'])
 @login_required
 def update_stop_status(route_id, stop_id):
     try:
         route = Route.query.get_or_404(route_id)
-        user = User.query.get(session['user_id'])
+        user = current_user()
         data = request.json
         
         # Check permissions
         if user.role == 'Clinician' and route.clinician_id != user.id:
-            return jsonify({'error': 'Access denied'}), 403
+            return json_response({'error': 'Access denied'}, 403)
         
         stop = RouteStop.query.filter_by(id=stop_id, route_id=route_id).first_or_404()
         
         if 'status' not in data:
-            return jsonify({'error': 'Status is required'}), 400
+            return json_response({'error': 'Status is required'}, 400)
         
         valid_statuses = ['pending', 'in-progress', 'completed', 'skipped']
         if data['status'] not in valid_statuses:
-            return jsonify({'error': 'Invalid status'}), 400
+            return json_response({'error': 'Invalid status'}, 400)
         
         stop.status = data['status']
         
@@ -197,21 +337,23 @@ def update_stop_status(route_id, stop_id):
             stop.departure_time = datetime.now()
         
         db.session.commit()
-        return jsonify(stop.to_dict())
+        _invalidate_route_listings(route.clinician_id, route.route_date)
+        return json_response(stop.to_dict())
         
     except Exception as e:
         db.session.rollback()
-        return jsonify({'error': str(e)}), 500
+        return json_response({'error': str(e)}, 500)
 
 @route_bp.route('/clinicians/<int:clinician_id>/routes', methods=['GET'])
 @login_required
+@cached_json_response(_clinician_routes_key)
 def get_clinician_routes(clinician_id):
     try:
-        user = User.query.get(session['user_id'])
+        user = current_user()
         
         # Check permissions
         if user.role == 'Clinician' and user.id != clinician_id:
-            return jsonify({'error': 'Access denied'}), 403
+            return json_response({'error': 'Access denied'}, 403)
         
         # Get query parameters
         start_date = request.args.get('start_date')
@@ -228,70 +370,62 @@ def get_clinician_routes(clinician_id):
             query = query.filter(Route.route_date <= end_dt)
         
         routes = query.order_by(Route.route_date.desc()).all()
-        return jsonify([route.to_dict() for route in routes])
+        return json_response([route.to_dict() for route in routes])
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return json_response({'error': str(e)}, 500)
 
 @route_bp.route('/routes/<int:route_id>', methods=['DELETE'])
 @login_required
 def delete_route(route_id):
     try:
         route = Route.query.get_or_404(route_id)
-        user = User.query.get(session['user_id'])
+        user = current_user()
         
         # Check permissions
         if user.role == 'Clinician' and route.clinician_id != user.id:
-            return jsonify({'error': 'Access denied'}), 403
+            return json_response({'error': 'Access denied'}, 403)
         
         # Delete route stops first
         RouteStop.query.filter_by(route_id=route_id).delete()
         
         # Delete route
+        clinician_id, route_date = route.clinician_id, route.route_date
         db.session.delete(route)
         db.session.commit()
+        _invalidate_route_listings(clinician_id, route_date)
         
         return '', 204
         
     except Exception as e:
         db.session.rollback()
-        return jsonify({'error': str(e)}), 500
+        return json_response({'error': str(e)}, 500)
 
 @route_bp.route('/routes/today', methods=['GET'])
 @login_required
+@cached_json_response(_today_routes_key)
 def get_today_routes():
     try:
-        user = User.query.get(session['user_id'])
+        user = current_user()
         today = date.today()
         
         if user.role == 'Clinician':
             # Get today's route for the clinician
-            route = Route.query.filter_by(
-                clinician_id=user.id,
-                route_date=today
-            ).first()
+            routes = _load_routes_with_stops(
+                Route.clinician_id == user.id,
+                Route.route_date == today
+            )
             
-            if route:
-                stops = RouteStop.query.filter_by(route_id=route.id).order_by(RouteStop.stop_order).all()
-                route_data = route.to_dict()
-                route_data['stops'] = [stop.to_dict() for stop in stops]
-                return jsonify(route_data)
+            if routes:
+                return json_response(routes[0])
             else:
-                return jsonify({'message': 'No route found for today'}), 404
+                return json_response({'message': 'No route found for today'}, 404)
         
         else:
-            # Admins can see all routes for today
-            routes = Route.query.filter_by(route_date=today).all()
-            routes_data = []
-            
-            for route in routes:
-                stops = RouteStop.query.filter_by(route_id=route.id).order_by(RouteStop.stop_order).all()
-                route_data = route.to_dict()
-                route_data['stops'] = [stop.to_dict() for stop in stops]
-                routes_data.append(route_data)
-            
-            return jsonify(routes_data)
+            # Admins can see all routes for today, loaded with their stops
+            # in a single query
+            return json_response(_load_routes_with_stops(Route.route_date == today))
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return json_response({'error': str(e)}, 500)
 
@@ -1,15 +1,63 @@
-from flask import Blueprint, jsonify, request
-from src.models.user import User, db
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+from src.models.user import User, VALID_ROLES, db
 from src.routes.auth import login_required, admin_required
+from src.utils.cache import cached_json_response, invalidate_cached_responses
+from src.utils.serialization import iter_json_array
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import load_only, raiseload
 
 user_bp = Blueprint('user', __name__)
 
+def _user_list_options():
+    """
+    Loader options for the user list endpoints.
+    
+    Only the columns User.to_dict() returns are loaded, leaving out
+    password_hash, and lazy loads are refused so a future relationship
+    access in to_dict() can't turn a list into one query per user. Built per
+    request: the mappers can't be configured at import time, before every
+    model module is loaded.
+    """
+    return (
+        load_only(User.id, User.username, User.email, User.role, User.phone,
+                  User.created_at, User.is_active),
+        raiseload('*')
+    )
+
+# Dashboards poll the user lists, which rarely change; every write below
+# drops the cached copies once it commits
+def _invalidate_user_lists():
+    invalidate_cached_responses(('user_lists',))
+
+def _stream_users(query):
+    """Stream a user query as a JSON array, fetching rows in batches."""
+    users = query.yield_per(500)
+    return Response(
+        stream_with_context(iter_json_array(user.to_dict() for user in users)),
+        mimetype='application/json'
+    )
+
+def _duplicate_field_error(error):
+    """
+    Map a unique-constraint violation on username/email to a 400 response.
+    
+    The constraint (PostgreSQL) or column (SQLite) name in the driver's
+    message identifies which field collided. Returns None for any other
+    integrity error.
+    """
+    message = str(error.orig)
+    if 'username' in message:
+        return jsonify({'error': 'Username already exists'}), 400
+    if 'email' in message:
+        return jsonify({'error': 'Email already exists'}), 400
+    return None
+
 @user_bp.route('/users', methods=['GET'])
 @admin_required
+@cached_json_response(lambda: ('user_lists', 'all'))
 def get_users():
     try:
-        users = User.query.all()
-        return jsonify([user.to_dict() for user in users])
+        return _stream_users(User.query.options(*_user_list_options()))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -25,16 +73,8 @@ def create_user():
             if field not in data:
                 return jsonify({'error': f'{field} is required'}), 400
         
-        # Check if user already exists
-        if User.query.filter_by(username=data['username']).first():
-            return jsonify({'error': 'Username already exists'}), 400
-        
-        if User.query.filter_by(email=data['email']).first():
-            return jsonify({'error': 'Email already exists'}), 400
-        
         # Validate role
-        valid_roles = ['Admin', 'Clinician', 'Office Staff']
-        if data['role'] not in valid_roles:
+        if data['role'] not in VALID_ROLES:
             return jsonify({'error': 'Invalid role'}), 400
         
         user = User(
@@ -45,10 +85,18 @@ def create_user():
         )
         user.set_password(data['password'])
         
+        # The unique constraints on username and email reject duplicates
         db.session.add(user)
         db.session.commit()
+        _invalidate_user_lists()
         return jsonify(user.to_dict()), 201
         
+    except IntegrityError as e:
+        db.session.rollback()
+        duplicate = _duplicate_field_error(e)
+        if duplicate:
+            return duplicate
+        return jsonify({'error': str(e)}), 500
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -57,7 +105,9 @@ def create_user():
 @login_required
 def get_user(user_id):
     try:
-        user = User.query.get_or_404(user_id)
+        user = db.session.get(User, user_id)
+        if user is None:
+            return jsonify({'error': 'User not found'}), 404
         return jsonify(user.to_dict())
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -66,22 +116,14 @@ def get_user(user_id):
 @admin_required
 def update_user(user_id):
     try:
-        user = User.query.get_or_404(user_id)
+        user = db.session.get(User, user_id)
+        if user is None:
+            return jsonify({'error': 'User not found'}), 404
         data = request.json
         
-        # Check for unique constraints
-        if 'username' in data and data['username'] != user.username:
-            if User.query.filter_by(username=data['username']).first():
-                return jsonify({'error': 'Username already exists'}), 400
-        
-        if 'email' in data and data['email'] != user.email:
-            if User.query.filter_by(email=data['email']).first():
-                return jsonify({'error': 'Email already exists'}), 400
-        
         # Validate role if provided
         if 'role' in data:
-            valid_roles = ['Admin', 'Clinician', 'Office Staff']
-            if data['role'] not in valid_roles:
+            if data['role'] not in VALID_ROLES:
                 return jsonify({'error': 'Invalid role'}), 400
         
         # Update user fields
@@ -95,9 +137,17 @@ def update_user(user_id):
         if 'password' in data:
             user.set_password(data['password'])
         
+        # A username or email taken by another user fails on commit
         db.session.commit()
+        _invalidate_user_lists()
         return jsonify(user.to_dict())
         
+    except IntegrityError as e:
+        db.session.rollback()
+        duplicate = _duplicate_field_error(e)
+        if duplicate:
+            return duplicate
+        return jsonify({'error': str(e)}), 500
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -106,9 +156,12 @@ def update_user(user_id):
 @admin_required
 def delete_user(user_id):
     try:
-        user = User.query.get_or_404(user_id)
+        user = db.session.get(User, user_id)
+        if user is None:
+            return jsonify({'error': 'User not found'}), 404
         db.session.delete(user)
         db.session.commit()
+        _invalidate_user_lists()
         return '', 204
     except Exception as e:
         db.session.rollback()
@@ -118,19 +171,20 @@ def delete_user(user_id):
 @admin_required
 def update_user_role(user_id):
     try:
-        user = User.query.get_or_404(user_id)
+        user = db.session.get(User, user_id)
+        if user is None:
+            return jsonify({'error': 'User not found'}), 404
         data = request.json
         
         if 'role' not in data:
             return jsonify({'error': 'Role is required'}), 400
         
-        valid_roles = ['Admin', 'Clinician', 'Office Staff']
-        if data['role'] not in valid_roles:
+        if data['role'] not in VALID_ROLES:
             return jsonify({'error': 'Invalid role'}), 400
         
         user.role = data['role']
         db.session.commit()
-        
+        _invalidate_user_lists()
         return jsonify(user.to_dict())
         
     except Exception as e:
@@ -139,10 +193,10 @@ def update_user_role(user_id):
 
 @user_bp.route('/clinicians', methods=['GET'])
 @login_required
+@cached_json_response(lambda: ('user_lists', 'clinicians'))
 def get_clinicians():
     try:
-        clinicians = User.query.filter_by(role='Clinician', is_active=True).all()
-        return jsonify([user.to_dict() for user in clinicians])
+        return _stream_users(User.query.options(*_user_list_options()).filter_by(role='Clinician', is_active=True))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -0,0 +1,98 @@
+"""
+In-process response caching for the Physical Therapy Management System.
+
+Frequently polled read endpoints keep their encoded JSON bodies here for a
+short time. Writers drop the affected entries after they commit, and the TTL
+bounds how stale another worker process's copy can get.
+"""
+
+from flask import current_app
+from functools import wraps
+from cachetools import TTLCache
+import threading
+
+# Seconds a cached response stays valid when nothing invalidates it
+RESPONSE_TTL = 60
+
+# Largest streamed body, in bytes, worth keeping; longer streams are passed
+# through without being collected
+MAX_STREAMED_BODY = 1024 * 1024
+
+_responses = TTLCache(maxsize=2048, ttl=RESPONSE_TTL)
+_responses_lock = threading.Lock()
+
+
+def cached_json_response(make_key):
+    """
+    Cache a view's successful JSON responses.
+
+    make_key is called with the view's keyword arguments inside the request
+    and returns a tuple identifying the response. Return None to bypass the
+    cache, e.g. for a request the view is going to reject; cached responses
+    are served without running the view, so the key must capture everything
+    the view's permission checks depend on.
+
+    Args:
+        make_key (callable): Builds the cache key for the current request
+
+    Returns:
+        callable: Decorator for the view function
+    """
+    def decorator(view):
+        @wraps(view)
+        def decorated_function(*args, **kwargs):
+            key = make_key(**kwargs)
+            if key is None:
+                return view(*args, **kwargs)
+
+            with _responses_lock:
+                body = _responses.get(key)
+            if body is not None:
+                return current_app.response_class(body, mimetype='application/json')
+
+            response = view(*args, **kwargs)
+            if getattr(response, 'status_code', None) == 200 and response.mimetype == 'application/json':
+                if response.is_streamed:
+                    response.response = _collect_stream(response.iter_encoded(), key)
+                else:
+                    with _responses_lock:
+                        _responses[key] = response.get_data()
+            return response
+        return decorated_function
+    return decorator
+
+
+def _collect_stream(chunks, key):
+    """
+    Pass a streamed body through, caching it once it has been sent in full.
+
+    Bodies larger than MAX_STREAMED_BODY, and streams that are cut short,
+    are not cached.
+    """
+    collected = []
+    size = 0
+    for chunk in chunks:
+        if collected is not None:
+            size += len(chunk)
+            if size > MAX_STREAMED_BODY:
+                collected = None
+            else:
+                collected.append(chunk)
+        yield chunk
+
+    if collected is not None:
+        with _responses_lock:
+            _responses[key] = b''.join(collected)
+
+
+def invalidate_cached_responses(prefix):
+    """
+    Drop every cached response whose key starts with prefix.
+
+    Args:
+        prefix (tuple): Leading elements of the keys to drop
+    """
+    size = len(prefix)
+    with _responses_lock:
+        for key in [key for key in _responses if key[:size] == prefix]:
+            _responses.pop(key, None)
@@ -5,16 +5,101 @@ This module provides utilities for creating, managing, and switching between
 tenant schemas in the Physical Therapy Management System.
 """
 
-from flask import current_app
-from sqlalchemy import text, create_engine
+from flask import current_app, g, has_app_context
+from sqlalchemy import event, inspect, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.engine import make_url
 from sqlalchemy.schema import CreateSchema, DropSchema
 from sqlalchemy.exc import ProgrammingError, IntegrityError
-from src.models.public import db, Company
+from src.models.public import (
+    db, Company, CompanyUser,
+    PERM_MANAGE_USERS, PERM_MANAGE_SETTINGS, PERM_VIEW_REPORTS, PERM_MANAGE_BILLING,
+)
+from datetime import datetime
+from functools import lru_cache
 import logging
 import os
+import re
+import subprocess
+import threading
+import time
+import weakref
 
 logger = logging.getLogger(__name__)
 
+# Seconds the list of tenant schemas is trusted before the catalog is read
+# again. Schemas created or dropped through this process update it at once.
+SCHEMA_CACHE_TTL = 60
+
+_schema_cache = None
+_schema_cache_loaded_at = 0.0
+_schema_cache_lock = threading.Lock()
+
+# DatabaseManager of each initialized app, by id(app). Values are weak, so an
+# entry disappears together with its app and manager.
+_db_managers = weakref.WeakValueDictionary()
+
+# First bytes of a pg_dump custom-format archive
+PG_DUMP_ARCHIVE_MAGIC = b'PGDMP'
+
+# Tenant slugs double as schema names: lowercase letters, digits, hyphens and
+# underscores, within PostgreSQL's 63-byte identifier limit
+TENANT_SLUG_PATTERN = re.compile(r'\A[a-z0-9][a-z0-9_-]{0,62}\Z')
+
+_identifier_preparer = postgresql.dialect().identifier_preparer
+
+# Rows seeded into every new tenant schema, as (table, rows, conflict
+# columns) entries added through register_tenant_default_data()
+_tenant_default_data = []
+
+
+def register_tenant_default_data(table, rows, index_elements):
+    """
+    Register default rows to insert when a tenant schema is provisioned.
+    
+    Rows that would violate the unique index on index_elements are skipped,
+    so provisioning can be re-run safely.
+    
+    Args:
+        table: Table (or model __table__) the rows belong to
+        rows (list): Column-value dicts, all with the same keys
+        index_elements (list): Columns of the unique index used for conflicts
+    """
+    _tenant_default_data.append((table, list(rows), list(index_elements)))
+
+
+@lru_cache(maxsize=1024)
+def tenant_schema_identifier(tenant_slug):
+    """
+    Validate a tenant slug and quote it for use as a schema name in SQL.
+    
+    Args:
+        tenant_slug (str): The tenant's unique slug identifier
+        
+    Returns:
+        str: The schema name, quoted where PostgreSQL requires it
+        
+    Raises:
+        ValueError: If the slug is not a valid tenant schema name
+    """
+    if not isinstance(tenant_slug, str) or not TENANT_SLUG_PATTERN.match(tenant_slug):
+        raise ValueError(f"Invalid tenant slug: {tenant_slug!r}")
+    return _identifier_preparer.quote_schema(tenant_slug)
+
+
+@event.listens_for(db.session, 'after_begin')
+def _apply_tenant_search_path(session, transaction, connection):
+    """
+    Scope each ORM transaction to the schema chosen by switch_schema().
+    
+    SET LOCAL lasts until the transaction ends, so connections go back to
+    the pool on the default search path.
+    """
+    tenant_slug = g.get('tenant_schema') if has_app_context() else None
+    if tenant_slug and connection.dialect.name == 'postgresql':
+        connection.execute(text(f'SET LOCAL search_path TO {tenant_schema_identifier(tenant_slug)}, public'))
+
+
 class DatabaseManager:
     """
     Manages database operations for multi-tenant architecture.
@@ -30,6 +115,12 @@ class DatabaseManager:
         """Initialize the database manager with Flask app"""
         self.app = app
         app.extensions['database_manager'] = self
+        _db_managers[id(app)] = self
+        
+        # Every schema operation below goes through the pooled db.engine
+        if 'sqlalchemy' in app.extensions and logger.isEnabledFor(logging.INFO):
+            with app.app_context():
+                logger.info("Database connection pool: %s", db.engine.pool.status())
     
     def create_tenant_schema(self, tenant_slug):
         """
@@ -42,31 +133,69 @@ class DatabaseManager:
             bool: True if schema was created successfully, False otherwise
         """
         try:
-            # Create the schema
-            with db.engine.connect() as connection:
-                connection.execute(CreateSchema(tenant_slug))
-                connection.commit()
-                logger.info(f"Created schema: {tenant_slug}")
-            
-            # Switch to the new schema and create tables
-            self.switch_schema(tenant_slug)
+            tenant_schema_identifier(tenant_slug)
             
-            # Create all tenant tables in the new schema
-            self._create_tenant_tables(tenant_slug)
-            
-            # Initialize default data
-            self._initialize_tenant_data(tenant_slug)
+            # Schema, tables and default data are created in one transaction,
+            # so a failure leaves nothing half-provisioned behind
+            with db.engine.begin() as connection:
+                connection.execute(CreateSchema(tenant_slug, if_not_exists=True))
+                logger.info("Created schema: %s", tenant_slug)
+                
+                # Create all tenant tables in the new schema
+                self._create_tenant_tables(connection, tenant_slug)
+                
+                # Initialize default data
+                self._initialize_tenant_data(connection, tenant_slug)
             
-            logger.info(f"Successfully created tenant schema: {tenant_slug}")
+            _remember_schema(tenant_slug)
+            logger.info("Successfully created tenant schema: %s", tenant_slug)
             return True
             
         except ProgrammingError as e:
-            logger.error(f"Error creating schema {tenant_slug}: {str(e)}")
+            logger.error("Error creating schema %s: %s", tenant_slug, e)
             return False
         except Exception as e:
-            logger.error(f"Unexpected error creating schema {tenant_slug}: {str(e)}")
+            logger.error("Unexpected error creating schema %s: %s", tenant_slug, e)
             return False
     
+    def provision_tenant_async(self, company_id, tenant_slug):
+        """
+        Create a tenant schema on a background thread.
+        
+        The company's provisioning_status is set to 'ready' or 'failed' once
+        the schema DDL finishes. Call this only after the company row has
+        been committed.
+        
+        Args:
+            company_id (int): ID of the company being provisioned
+            tenant_slug (str): The tenant's unique slug identifier
+            
+        Returns:
+            threading.Thread: The started worker thread
+        """
+        app = current_app._get_current_object()
+        worker = threading.Thread(
+            target=self._provision_tenant,
+            args=(app, company_id, tenant_slug),
+            name=f"provision-{tenant_slug}",
+            daemon=True
+        )
+        worker.start()
+        return worker
+    
+    def _provision_tenant(self, app, company_id, tenant_slug):
+        """Worker body for provision_tenant_async."""
+        with app.app_context():
+            try:
+                created = self.create_tenant_schema(tenant_slug)
+                status = 'ready' if created else 'failed'
+                Company.query.filter_by(id=company_id).update({'provisioning_status': status})
+                db.session.commit()
+                logger.info("Provisioning of %s finished: %s", tenant_slug, status)
+            except Exception as e:
+                logger.error("Error provisioning tenant %s: %s", tenant_slug, e)
+                db.session.rollback()
+    
     def drop_tenant_schema(self, tenant_slug):
         """
         Drop a tenant schema and all its data.
@@ -78,55 +207,84 @@ class DatabaseManager:
             bool: True if schema was dropped successfully, False otherwise
         """
         try:
+            tenant_schema_identifier(tenant_slug)
+            
             with db.engine.connect() as connection:
                 connection.execute(DropSchema(tenant_slug, cascade=True))
                 connection.commit()
-                logger.info(f"Dropped schema: {tenant_slug}")
+                logger.info("Dropped schema: %s", tenant_slug)
+            _forget_schema(tenant_slug)
             return True
             
         except ProgrammingError as e:
-            logger.error(f"Error dropping schema {tenant_slug}: {str(e)}")
+            logger.error("Error dropping schema %s: %s", tenant_slug, e)
             return False
         except Exception as e:
-            logger.error(f"Unexpected error dropping schema {tenant_slug}: {str(e)}")
+            logger.error("Unexpected error dropping schema %s: %s", tenant_slug, e)
             return False
     
     def switch_schema(self, tenant_slug):
         """
-        Switch the database connection to use a specific tenant schema.
+        Switch the ORM session to a specific tenant schema.
+        
+        The schema is recorded on the app context and applied with SET LOCAL
+        at the start of every session transaction, on the connection the
+        session actually uses. A transaction that is already open is
+        switched straight away.
         
         Args:
             tenant_slug (str): The tenant's unique slug identifier
         """
         try:
-            with db.engine.connect() as connection:
-                connection.execute(text(f'SET search_path TO "{tenant_slug}", public'))
-                connection.commit()
-                logger.debug(f"Switched to schema: {tenant_slug}")
+            identifier = tenant_schema_identifier(tenant_slug)
+            g.tenant_schema = tenant_slug
+            self._apply_search_path(f'{identifier}, public')
+            logger.debug("Switched to schema: %s", tenant_slug)
                 
         except Exception as e:
-            logger.error(f"Error switching to schema {tenant_slug}: {str(e)}")
+            logger.error("Error switching to schema %s: %s", tenant_slug, e)
             raise
     
     def reset_schema(self):
-        """Reset the database connection to use the default public schema."""
+        """
+        Reset the ORM session to use the default public schema.
+        
+        Does nothing when no tenant schema is active, so the resets in
+        public_route and after_request are free on most requests.
+        """
+        if not g.get('tenant_schema'):
+            return
+        
         try:
-            with db.engine.connect() as connection:
-                connection.execute(text('SET search_path TO public'))
-                connection.commit()
-                logger.debug("Reset to public schema")
+            g.tenant_schema = None
+            self._apply_search_path('public')
+            logger.debug("Reset to public schema")
                 
         except Exception as e:
-            logger.error(f"Error resetting to public schema: {str(e)}")
+            logger.error("Error resetting to public schema: %s", e)
             raise
     
+    def _apply_search_path(self, search_path):
+        """Change the search path of the session's open transaction, if any."""
+        session = db.session()
+        if session.in_transaction() and db.engine.dialect.name == 'postgresql':
+            session.execute(text(f'SET LOCAL search_path TO {search_path}'))
+    
     def get_tenant_schemas(self):
         """
         Get a list of all tenant schemas in the database.
         
+        The list is cached for SCHEMA_CACHE_TTL seconds.
+        
         Returns:
             list: List of schema names
         """
+        global _schema_cache, _schema_cache_loaded_at
+        
+        with _schema_cache_lock:
+            if _schema_cache is not None and time.monotonic() - _schema_cache_loaded_at < SCHEMA_CACHE_TTL:
+                return sorted(_schema_cache)
+        
         try:
             with db.engine.connect() as connection:
                 result = connection.execute(text("""
@@ -136,41 +294,58 @@ class DatabaseManager:
                     ORDER BY schema_name
                 """))
                 schemas = [row[0] for row in result]
-                return schemas
+            
+            with _schema_cache_lock:
+                _schema_cache = set(schemas)
+                _schema_cache_loaded_at = time.monotonic()
+            return schemas
                 
         except Exception as e:
-            logger.error(f"Error getting tenant schemas: {str(e)}")
+            logger.error("Error getting tenant schemas: %s", e)
             return []
     
     def schema_exists(self, tenant_slug):
         """
         Check if a tenant schema exists.
         
+        Known schemas are answered from the cache kept by
+        get_tenant_schemas(); anything else is checked against the catalog,
+        so a schema created by another process is never reported missing.
+        
         Args:
             tenant_slug (str): The tenant's unique slug identifier
             
         Returns:
             bool: True if schema exists, False otherwise
         """
+        if tenant_slug in self.get_tenant_schemas():
+            return True
+        
         try:
             with db.engine.connect() as connection:
                 result = connection.execute(text("""
-                    SELECT COUNT(*) 
-                    FROM information_schema.schemata 
-                    WHERE schema_name = :schema_name
+                    SELECT EXISTS (
+                        SELECT 1
+                        FROM information_schema.schemata 
+                        WHERE schema_name = :schema_name
+                    )
                 """), {'schema_name': tenant_slug})
-                count = result.scalar()
-                return count > 0
+                exists = bool(result.scalar())
+            
+            if exists:
+                _remember_schema(tenant_slug)
+            return exists
                 
         except Exception as e:
-            logger.error(f"Error checking if schema exists {tenant_slug}: {str(e)}")
+            logger.error("Error checking if schema exists %s: %s", tenant_slug, e)
             return False
     
-    def _create_tenant_tables(self, tenant_slug):
+    def _create_tenant_tables(self, connection, tenant_slug):
         """
         Create all tenant-specific tables in the given schema.
         
         Args:
+            connection: Connection with the provisioning transaction open
             tenant_slug (str): The tenant's unique slug identifier
         """
         try:
@@ -183,45 +358,49 @@ class DatabaseManager:
             from src.models.route import Route
             from src.models.tenant_user import TenantUserProfile, UserSession, AuditLog
             
-            # Create all tables in the tenant schema
-            with db.engine.connect() as connection:
-                # Set search path to the tenant schema
-                connection.execute(text(f'SET search_path TO "{tenant_slug}", public'))
-                
-                # Create tables using SQLAlchemy metadata
-                db.metadata.create_all(bind=connection, checkfirst=True)
-                connection.commit()
-                
-                logger.info(f"Created tables in schema: {tenant_slug}")
+            # Patient search relies on trigram indexes; the extension is
+            # database-wide and kept in public
+            if connection.dialect.name == 'postgresql':
+                connection.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm WITH SCHEMA public'))
+            
+            # Set search path to the tenant schema for this transaction
+            connection.execute(text(f'SET LOCAL search_path TO {tenant_schema_identifier(tenant_slug)}, public'))
+            
+            # Create tables using SQLAlchemy metadata
+            db.metadata.create_all(bind=connection, checkfirst=True)
+            
+            logger.info("Created tables in schema: %s", tenant_slug)
                 
         except Exception as e:
-            logger.error(f"Error creating tables in schema {tenant_slug}: {str(e)}")
+            logger.error("Error creating tables in schema %s: %s", tenant_slug, e)
             raise
     
-    def _initialize_tenant_data(self, tenant_slug):
+    def _initialize_tenant_data(self, connection, tenant_slug):
         """
         Initialize default data for a new tenant.
         
+        Runs on the provisioning connection, after _create_tenant_tables()
+        has pointed its search path at the tenant schema.
+        
         Args:
+            connection: Connection with the provisioning transaction open
             tenant_slug (str): The tenant's unique slug identifier
         """
         try:
-            # Switch to tenant schema
-            self.switch_schema(tenant_slug)
+            # One INSERT ... ON CONFLICT DO NOTHING per table, with all of its
+            # rows sent as a single executemany
+            for table, rows, index_elements in _tenant_default_data:
+                if rows:
+                    connection.execute(
+                        postgresql.insert(table).on_conflict_do_nothing(index_elements=index_elements),
+                        rows
+                    )
             
-            # Add any default data here
-            # For example, default appointment types, note templates, etc.
-            
-            db.session.commit()
-            logger.info(f"Initialized default data for schema: {tenant_slug}")
+            logger.info("Initialized default data for schema: %s", tenant_slug)
             
         except Exception as e:
-            logger.error(f"Error initializing data for schema {tenant_slug}: {str(e)}")
-            db.session.rollback()
+            logger.error("Error initializing data for schema %s: %s", tenant_slug, e)
             raise
-        finally:
-            # Reset to public schema
-            self.reset_schema()
     
     def migrate_tenant_schemas(self, migration_function=None):
         """
@@ -234,24 +413,108 @@ class DatabaseManager:
         
         for schema in tenant_schemas:
             try:
-                logger.info(f"Migrating schema: {schema}")
-                self.switch_schema(schema)
+                logger.info("Migrating schema: %s", schema)
                 
                 if migration_function:
+                    self.switch_schema(schema)
                     migration_function()
+                    db.session.commit()
                 else:
                     # Default migration: create any missing tables
-                    db.metadata.create_all(bind=db.engine, checkfirst=True)
+                    self._create_missing_tables(schema)
                 
-                db.session.commit()
-                logger.info(f"Successfully migrated schema: {schema}")
+                logger.info("Successfully migrated schema: %s", schema)
                 
             except Exception as e:
-                logger.error(f"Error migrating schema {schema}: {str(e)}")
+                logger.error("Error migrating schema %s: %s", schema, e)
                 db.session.rollback()
             finally:
                 self.reset_schema()
     
+    def upgrade_company_user_permissions(self):
+        """
+        Move company_user's permission booleans into permissions_mask.
+        
+        Adds the permissions_mask column, backfills it from the old can_*
+        columns and then drops them, all in one transaction. Safe to run
+        again once the upgrade has been applied.
+        """
+        table = CompanyUser.__table__
+        table_name = f'{table.schema}.{table.name}'
+        flags = [
+            ('can_manage_users', PERM_MANAGE_USERS),
+            ('can_manage_settings', PERM_MANAGE_SETTINGS),
+            ('can_view_reports', PERM_VIEW_REPORTS),
+            ('can_manage_billing', PERM_MANAGE_BILLING),
+        ]
+        
+        with db.engine.begin() as connection:
+            columns = {
+                column['name']
+                for column in inspect(connection).get_columns(table.name, schema=table.schema)
+            }
+            old_columns = [(name, bit) for name, bit in flags if name in columns]
+            
+            connection.execute(text(
+                f'ALTER TABLE {table_name} '
+                'ADD COLUMN IF NOT EXISTS permissions_mask SMALLINT NOT NULL DEFAULT 0'
+            ))
+            
+            if old_columns:
+                mask = ' | '.join(
+                    f'(CASE WHEN {name} THEN {bit} ELSE 0 END)' for name, bit in old_columns
+                )
+                connection.execute(text(f'UPDATE {table_name} SET permissions_mask = {mask}'))
+                for name, _ in old_columns:
+                    connection.execute(text(f'ALTER TABLE {table_name} DROP COLUMN {name}'))
+                logger.info("Backfilled %s.permissions_mask from %s",
+                            table_name, ', '.join(name for name, _ in old_columns))
+    
+    def upgrade_company_provisioning_status(self):
+        """
+        Add company.provisioning_status to databases created without it.
+        
+        Companies that already exist were provisioned synchronously, so the
+        column's default marks them 'ready'. Safe to run again.
+        """
+        table = Company.__table__
+        with db.engine.begin() as connection:
+            connection.execute(text(
+                f'ALTER TABLE {table.schema}.{table.name} '
+                "ADD COLUMN IF NOT EXISTS provisioning_status VARCHAR(20) DEFAULT 'ready'"
+            ))
+        logger.info("Upgraded %s.%s provisioning_status", table.schema, table.name)
+    
+    def upgrade_patient_coordinates(self):
+        """
+        Add patient.latitude and patient.longitude to every tenant schema.
+        
+        Schemas created before the columns existed don't have them, and
+        _create_missing_tables only adds whole tables. Safe to run again.
+        """
+        self.migrate_tenant_schemas(_add_patient_coordinates)
+    
+    def _create_missing_tables(self, schema):
+        """
+        Create the tenant tables a schema does not have yet.
+        
+        The schema's existing tables are read with a single catalog query,
+        rather than one existence check per table, and everything runs in
+        one transaction.
+        
+        Args:
+            schema (str): Tenant schema to bring up to date
+        """
+        with db.engine.begin() as connection:
+            connection.execute(text(f'SET LOCAL search_path TO {tenant_schema_identifier(schema)}, public'))
+            existing = set(inspect(connection).get_table_names(schema=schema))
+            
+            # Tables pinned to a schema (the public models) are not per-tenant
+            for table in db.metadata.sorted_tables:
+                if table.schema is None and table.name not in existing:
+                    table.create(connection, checkfirst=False)
+                    logger.info("Created table %s in schema: %s", table.name, schema)
+    
     def backup_tenant_schema(self, tenant_slug, backup_path=None):
         """
         Create a backup of a tenant schema.
@@ -263,36 +526,41 @@ class DatabaseManager:
         Returns:
             str: Path to the backup file
         """
-        if not backup_path:
-            backup_path = f"/tmp/{tenant_slug}_backup.sql"
-        
         try:
-            # Use pg_dump to create schema backup
-            db_url = current_app.config['SQLALCHEMY_DATABASE_URI']
-            # Parse database URL to get connection parameters
-            # This is a simplified version - you might want to use a proper URL parser
+            # The slug also becomes part of the default file name
+            tenant_schema_identifier(tenant_slug)
+            if not backup_path:
+                backup_path = f"/tmp/{tenant_slug}_backup.dump"
             
-            import subprocess
+            # Use pg_dump to create schema backup; it writes the file itself,
+            # so only stderr is kept, and only decoded if the dump fails. The
+            # compressed custom format can be restored in parallel.
             cmd = [
                 'pg_dump',
+                '--format', 'custom',
                 '--schema', tenant_slug,
                 '--file', backup_path,
                 '--no-owner',
-                '--no-privileges',
-                db_url
+                '--no-privileges'
             ]
             
-            result = subprocess.run(cmd, capture_output=True, text=True)
+            result = subprocess.run(
+                cmd,
+                env=_libpq_env(),
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                check=False
+            )
             
             if result.returncode == 0:
-                logger.info(f"Successfully backed up schema {tenant_slug} to {backup_path}")
+                logger.info("Successfully backed up schema %s to %s", tenant_slug, backup_path)
                 return backup_path
             else:
-                logger.error(f"Error backing up schema {tenant_slug}: {result.stderr}")
+                logger.error("Error backing up schema %s: %s", tenant_slug, result.stderr.decode(errors='replace'))
                 return None
                 
         except Exception as e:
-            logger.error(f"Error backing up schema {tenant_slug}: {str(e)}")
+            logger.error("Error backing up schema %s: %s", tenant_slug, e)
             return None
     
     def restore_tenant_schema(self, tenant_slug, backup_path):
@@ -307,57 +575,173 @@ class DatabaseManager:
             bool: True if restore was successful, False otherwise
         """
         try:
+            tenant_schema_identifier(tenant_slug)
+            
             # First, drop the existing schema if it exists
             if self.schema_exists(tenant_slug):
                 self.drop_tenant_schema(tenant_slug)
             
-            # Use psql to restore from backup
-            db_url = current_app.config['SQLALCHEMY_DATABASE_URI']
+            env = _libpq_env()
             
-            import subprocess
-            cmd = [
-                'psql',
-                '--file', backup_path,
-                db_url
-            ]
+            with open(backup_path, 'rb') as backup_file:
+                is_archive = backup_file.read(len(PG_DUMP_ARCHIVE_MAGIC)) == PG_DUMP_ARCHIVE_MAGIC
+            
+            if is_archive:
+                # Restore tables and indexes in parallel across CPU cores
+                cmd = [
+                    'pg_restore',
+                    '--jobs', str(os.cpu_count() or 4),
+                    '--no-owner',
+                    '--no-privileges',
+                    '--dbname', env['PGDATABASE'],
+                    backup_path
+                ]
+            else:
+                # Plain SQL backups taken before the custom format was used
+                cmd = [
+                    'psql',
+                    '--file', backup_path
+                ]
             
-            result = subprocess.run(cmd, capture_output=True, text=True)
+            result = subprocess.run(
+                cmd,
+                env=env,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                check=False
+            )
             
             if result.returncode == 0:
-                logger.info(f"Successfully restored schema {tenant_slug} from {backup_path}")
+                _remember_schema(tenant_slug)
+                logger.info("Successfully restored schema %s from %s", tenant_slug, backup_path)
                 return True
             else:
-                logger.error(f"Error restoring schema {tenant_slug}: {result.stderr}")
+                logger.error("Error restoring schema %s: %s", tenant_slug, result.stderr.decode(errors='replace'))
                 return False
                 
         except Exception as e:
-            logger.error(f"Error restoring schema {tenant_slug}: {str(e)}")
+            logger.error("Error restoring schema %s: %s", tenant_slug, e)
             return False
 
 
+def upgrade_route_stop_timestamps(engine):
+    """
+    Add route_stop.updated_at to a database created without it.
+    
+    Route stops live in the single-tenant database, which may be SQLite, so
+    the column is looked up first rather than added with IF NOT EXISTS.
+    Existing stops are stamped with the current time. Safe to run again.
+    
+    Args:
+        engine: Engine of the database holding route_stop
+    """
+    with engine.begin() as connection:
+        columns = {column['name'] for column in inspect(connection).get_columns('route_stop')}
+        if 'updated_at' in columns:
+            return
+        
+        connection.execute(text('ALTER TABLE route_stop ADD COLUMN updated_at TIMESTAMP'))
+        connection.execute(text('UPDATE route_stop SET updated_at = :now'), {'now': datetime.utcnow()})
+    logger.info("Added route_stop.updated_at")
+
+
+def _add_patient_coordinates():
+    """Tenant migration run by DatabaseManager.upgrade_patient_coordinates()."""
+    # switch_schema() puts the tenant schema first on the search path
+    db.session.execute(text(
+        'ALTER TABLE patient '
+        'ADD COLUMN IF NOT EXISTS latitude DOUBLE PRECISION, '
+        'ADD COLUMN IF NOT EXISTS longitude DOUBLE PRECISION'
+    ))
+
+
+def _libpq_env():
+    """
+    Environment for the PostgreSQL command-line tools.
+    
+    Connection settings from SQLALCHEMY_DATABASE_URI are passed as libpq
+    variables rather than on the command line, which keeps the password
+    out of the process list.
+    
+    Returns:
+        dict: Copy of os.environ with the PG* variables set
+    """
+    url = make_url(current_app.config['SQLALCHEMY_DATABASE_URI'])
+    env = dict(os.environ)
+    for variable, value in (
+        ('PGHOST', url.host),
+        ('PGPORT', url.port),
+        ('PGUSER', url.username),
+        ('PGPASSWORD', url.password),
+        ('PGDATABASE', url.database)
+    ):
+        if value is not None:
+            env[variable] = str(value)
+    return env
+
+
+def _remember_schema(tenant_slug):
+    """Record a schema that is known to exist in the cached schema list."""
+    with _schema_cache_lock:
+        if _schema_cache is not None:
+            _schema_cache.add(tenant_slug)
+
+
+def _forget_schema(tenant_slug):
+    """Remove a dropped schema from the cached schema list."""
+    with _schema_cache_lock:
+        if _schema_cache is not None:
+            _schema_cache.discard(tenant_slug)
+
+
 class TenantContext:
     """
     Context manager for temporarily switching to a tenant schema.
     
+    Within a request this only changes the tenant recorded on g and the
+    search path of the session's current transaction; no extra connection
+    is used. The previous tenant and schema are restored on exit.
+    
     Usage:
         with TenantContext('tenant_slug'):
             # All database operations will use the tenant schema
             patients = Patient.query.all()
+    
+    Without a db_manager or app, the manager is looked up through
+    current_app. Loops should resolve the app once and pass it in:
+        app = current_app._get_current_object()
+        for slug in tenant_slugs:
+            with TenantContext(slug, app=app):
+                ...
     """
     
-    def __init__(self, tenant_slug, db_manager=None):
+    __slots__ = ('tenant_slug', 'db_manager', 'original_schema', 'original_tenant')
+    
+    def __init__(self, tenant_slug, db_manager=None, app=None):
         self.tenant_slug = tenant_slug
-        self.db_manager = db_manager or current_app.extensions.get('database_manager')
+        if db_manager is None:
+            if app is None:
+                app = current_app._get_current_object()
+            db_manager = _db_managers.get(id(app))
+        self.db_manager = db_manager
         self.original_schema = None
+        self.original_tenant = None
     
     def __enter__(self):
+        self.original_tenant = get_current_tenant()
+        set_current_tenant(self.tenant_slug)
         if self.db_manager:
+            self.original_schema = g.get('tenant_schema')
             self.db_manager.switch_schema(self.tenant_slug)
         return self
     
     def __exit__(self, exc_type, exc_val, exc_tb):
         if self.db_manager:
-            self.db_manager.reset_schema()
+            if self.original_schema:
+                self.db_manager.switch_schema(self.original_schema)
+            else:
+                self.db_manager.reset_schema()
+        set_current_tenant(self.original_tenant)
 
 
 def get_current_tenant():
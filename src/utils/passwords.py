@@ -0,0 +1,105 @@
+"""
+Password hashing utilities for the Physical Therapy Management System.
+
+Passwords are hashed with Argon2id. Hashes created by the previous werkzeug
+scheme are still accepted and are upgraded the next time the user logs in.
+"""
+
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
+from werkzeug.security import check_password_hash
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import os
+
+ARGON2_PREFIX = '$argon2'
+
+# Cost parameters are tunable per deployment; the defaults follow the OWASP
+# Argon2id baseline and verify in roughly 50 ms on typical server hardware
+_hasher = PasswordHasher(
+    time_cost=int(os.environ.get('ARGON2_TIME_COST', 2)),
+    memory_cost=int(os.environ.get('ARGON2_MEMORY_COST', 19456)),
+    parallelism=int(os.environ.get('ARGON2_PARALLELISM', 1))
+)
+
+# New hashes are computed on a small shared pool. argon2-cffi releases the
+# GIL while hashing, so other request threads keep running, and the pool
+# caps how many hashes (each holding memory_cost KiB) run at once during a
+# burst of sign-ups or password changes.
+_hash_pool = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('PASSWORD_HASH_WORKERS', os.cpu_count() or 2)),
+    thread_name_prefix='password-hash'
+)
+
+
+def hash_password(password):
+    """
+    Hash a password with Argon2id.
+
+    Args:
+        password (str): Plain text password
+
+    Returns:
+        str: Encoded Argon2id hash
+    """
+    return _hash_pool.submit(_hasher.hash, password).result()
+
+
+def verify_password(password_hash, password):
+    """
+    Check a password against a stored Argon2id or legacy werkzeug hash.
+
+    Args:
+        password_hash (str): Stored password hash
+        password (str): Plain text password to check
+
+    Returns:
+        bool: True if the password matches, False otherwise
+    """
+    if not password_hash:
+        return False
+
+    if password_hash.startswith(ARGON2_PREFIX):
+        try:
+            return _hasher.verify(password_hash, password)
+        except (VerificationError, InvalidHashError):
+            return False
+
+    return check_password_hash(password_hash, password)
+
+
+def password_needs_rehash(password_hash):
+    """
+    Check whether a stored hash should be replaced with a fresh Argon2id hash.
+
+    Args:
+        password_hash (str): Stored password hash
+
+    Returns:
+        bool: True for legacy hashes or hashes with outdated cost parameters
+    """
+    if not password_hash or not password_hash.startswith(ARGON2_PREFIX):
+        return True
+    return _hasher.check_needs_rehash(password_hash)
+
+
+@lru_cache(maxsize=1)
+def _dummy_hash():
+    return _hasher.hash('dummy-password-for-timing-equalization')
+
+
+def burn_password_check(password):
+    """
+    Spend the same time as a real verification without a stored hash.
+
+    Call this when no account matches a login so that an unknown username
+    takes as long to reject as a wrong password.
+
+    Args:
+        password (str): Submitted password
+
+    Returns:
+        bool: Always False
+    """
+    verify_password(_dummy_hash(), password)
+    return False
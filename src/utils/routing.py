@@ -0,0 +1,94 @@
+"""
+Route planning utilities for the Physical Therapy Management System.
+
+Provides great-circle distances and a nearest-neighbor visiting order for a
+clinician's home visits. Routes hold a day's worth of stops, so plain Python
+is fast enough here.
+"""
+
+from math import asin, cos, radians, sin, sqrt
+
+EARTH_RADIUS_MILES = 3958.8
+
+# Average driving speed used to turn distances into travel time
+AVERAGE_SPEED_MPH = 20
+
+
+def haversine_miles(origin, destination):
+    """
+    Great-circle distance between two points.
+
+    Args:
+        origin (tuple): (latitude, longitude) in degrees
+        destination (tuple): (latitude, longitude) in degrees
+
+    Returns:
+        float: Distance in miles
+    """
+    lat1, lon1 = radians(origin[0]), radians(origin[1])
+    lat2, lon2 = radians(destination[0]), radians(destination[1])
+    h = sin((lat2 - lat1) / 2) ** 2 + cos(lat1) * cos(lat2) * sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * asin(sqrt(h))
+
+
+def travel_minutes(miles):
+    """
+    Estimate driving time for a distance.
+
+    Args:
+        miles (float): Distance in miles
+
+    Returns:
+        int: Estimated minutes at AVERAGE_SPEED_MPH
+    """
+    return round(miles / AVERAGE_SPEED_MPH * 60)
+
+
+def nearest_neighbor_order(coords, windows=None):
+    """
+    Order points by repeatedly travelling to the closest unvisited one.
+
+    With windows, points are visited window by window in ascending order and
+    only reordered among the points sharing a window, so fixed appointment
+    times are never visited out of order.
+
+    Args:
+        coords (list): (latitude, longitude) pairs
+        windows (list): Optional sortable window per point, e.g. its start time
+
+    Returns:
+        tuple: (visiting order as indexes into coords, leg distances in miles)
+    """
+    if not coords:
+        return [], []
+
+    # Pairwise distances are computed once; the matrix is symmetric
+    count = len(coords)
+    distances = [[0.0] * count for _ in range(count)]
+    for i in range(count):
+        for j in range(i + 1, count):
+            distances[i][j] = distances[j][i] = haversine_miles(coords[i], coords[j])
+
+    by_window = {}
+    for index, window in enumerate(windows if windows is not None else [None] * count):
+        by_window.setdefault(window, []).append(index)
+    window_keys = sorted(by_window) if windows is not None else [None]
+
+    # The walk starts from the first point of the first window
+    order = []
+    legs = []
+    current = None
+    for window in window_keys:
+        unvisited = set(by_window[window])
+        while unvisited:
+            if current is None:
+                nearest = min(unvisited)
+            else:
+                row = distances[current]
+                nearest = min(unvisited, key=row.__getitem__)
+                legs.append(row[nearest])
+            order.append(nearest)
+            unvisited.remove(nearest)
+            current = nearest
+
+    return order, legs
@@ -0,0 +1,84 @@
+"""
+JSON response helpers for the Physical Therapy Management System.
+
+Responses are encoded with orjson, which serializes dataclasses and
+datetimes natively and is considerably faster than the stdlib encoder
+behind Flask's jsonify.
+"""
+
+from flask import current_app, request
+import orjson
+
+
+def json_response(payload, status=200):
+    """
+    Build a JSON response encoded with orjson.
+
+    Args:
+        payload: Dicts, lists, dataclasses or other orjson-serializable data
+        status (int): HTTP status code
+
+    Returns:
+        Response: Flask response with an application/json body
+    """
+    return current_app.response_class(
+        orjson.dumps(payload),
+        status=status,
+        mimetype='application/json'
+    )
+
+
+def iter_json_array(items):
+    """
+    Encode an iterable as a JSON array, one element at a time.
+
+    Meant for streaming responses, so large result sets never have to be
+    held in memory or encoded in one piece.
+
+    Args:
+        items: Iterable of orjson-serializable values
+
+    Yields:
+        bytes: Successive chunks of the encoded array
+    """
+    yield b'['
+    separator = b''
+    for item in items:
+        yield separator + orjson.dumps(item)
+        separator = b','
+    yield b']'
+
+
+def conditional_json_response(etag, build_payload):
+    """
+    Answer a GET with 304 Not Modified when the client already holds etag.
+
+    build_payload is only called when the client's copy is stale, so a cache
+    hit skips serialization entirely.
+
+    Args:
+        etag (str): Weak entity tag for the current version, unquoted
+        build_payload (callable): Returns the JSON payload for a full response
+
+    Returns:
+        Response: 304 with no body, or 200 with the payload; both carry the ETag
+    """
+    if request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = json_response(build_payload())
+    response.set_etag(etag, weak=True)
+    return response
+
+
+def version_tag(moment):
+    """
+    Encode a last-modified timestamp for use in an entity tag.
+
+    Args:
+        moment (datetime): Row modification time, or None
+
+    Returns:
+        int: Microseconds since the epoch, or 0 for None
+    """
+    return int(moment.timestamp() * 1_000_000) if moment else 0